@@ -3,13 +3,52 @@ CampusBite - AI Nutrition Coach with Function Calling
 Uses GPT-4o-mini with tools to query the menu database intelligently
 """
 import os
-import json
-from openai import OpenAI
-from tools import TOOL_DEFINITIONS, TOOL_FUNCTIONS
-
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
+import asyncio
+import logging
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from cachetools import TTLCache
+from openai import AsyncOpenAI
+import aio
+from tools import EST, TOOL_DEFINITIONS, TOOL_FUNCTIONS, get_current_time, list_locations
+
+# Initialize OpenAI client (async, so waiting on the API never blocks the event loop)
+client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+# Shared pool for running the independent tool calls of one assistant turn in parallel
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+logger = logging.getLogger(__name__)
+
+# Tool results only change when the menu database is reloaded, so identical calls
+# (common in follow-up questions) are served from cache. Bump CACHE_EPOCH to invalidate.
+CACHE_EPOCH = 0
+_TOOL_CACHE = TTLCache(maxsize=512, ttl=3600)
+_TOOL_CACHE_LOCK = threading.Lock()
+
+# Tools whose results include the current time can't be cached
+_UNCACHED_TOOLS = {"get_current_time", "get_location_hours"}
+
+# The current time is injected into every conversation up front, so the model is
+# never offered get_current_time. The same list is sent on every round to keep
+# the cached prompt prefix (tools + system prompt) identical.
+CHAT_TOOLS = [t for t in TOOL_DEFINITIONS if t["function"]["name"] != "get_current_time"]
+
+# Bounds on the tool-calling loop: after FORCE_ANSWER_AFTER rounds the model may no
+# longer call tools, and a conversation never runs more than MAX_TOOL_ROUNDS
+# completions or spends more than TOKEN_BUDGET tokens.
+MAX_TOOL_ROUNDS = 5
+FORCE_ANSWER_AFTER = 3
+TOKEN_BUDGET = 60000
+FALLBACK_RESPONSE = (
+    "Sorry, I couldn't put together a recommendation for that. "
+    "Try asking about a specific dish, dining hall, or nutrition goal."
+)
+
+# Keep SYSTEM_PROMPT static and always send it as the first message: OpenAI caches
+# prompt prefixes of 1024+ tokens automatically, so per-request text must come after it.
 SYSTEM_PROMPT = """You are CampusBite, a friendly and knowledgeable nutrition coach for college students. You help them find the perfect meal based on their cravings, dietary needs, and nutritional goals.
 
 Your personality:
@@ -48,7 +87,7 @@ If you find that any of these keywords (or similar misspellings) appear in the u
 
 FULL MENU REQUESTS (CRITICAL - IGNORE TIME):
 When user asks to "list", "show", "see the menu", "full menu", or wants to know "what's available":
-1. Do NOT call get_current_time() - time is IRRELEVANT for full menu requests
+1. IGNORE the current time - time is IRRELEVANT for full menu requests
 2. If they specify a location: IMMEDIATELY call get_full_day_menu(location)
 3. If they DON'T specify a location: Ask "Which dining hall?" with options: Palladium, Third North, Downstein, Lipton, Kimmel, Crave NYU, Upstein, Jasper Kane, Kosher Eatery
 4. List EVERY SINGLE ITEM from the response - DO NOT SUMMARIZE, DO NOT TRUNCATE, DO NOT SAY "and more..."
@@ -118,7 +157,7 @@ DINING HALL REALITY:
 Students can visit MULTIPLE STATIONS within the same dining hall. If pasta is at the "Cucina" station and chicken is at the "Grill" station, that's fine - both are at the SAME dining hall and can be combined.
 
 WORKFLOW:
-1. Use get_current_time() FIRST to know the current time, day, and whether it's a weekday/weekend
+1. Check the current time, day, and whether it's a weekday/weekend (provided in the context message - no tool call needed)
 2. Understand what user wants - are they asking for a SPECIFIC FOOD (pasta, tacos, rice bowl) or GENERAL meal?
 3. For GENERAL requests: Use get_complete_meals() for ready-to-eat options
 4. For SPECIFIC FOOD requests (pasta, rice, tacos, etc.):
@@ -198,32 +237,122 @@ IMPORTANT: Never present a base item alone. ALWAYS build a complete meal around
 """
 
 
+def _log_usage(usage) -> int:
+    """
+    Log token usage, including how much of the prompt was served from OpenAI's prompt cache.
+
+    Returns:
+        Total tokens used by the completion (0 if usage wasn't reported)
+    """
+    if usage is None:
+        return 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    logger.info(
+        "OpenAI usage: %d prompt tokens (%d cached), %d completion tokens",
+        usage.prompt_tokens, cached_tokens, usage.completion_tokens
+    )
+    return usage.total_tokens
+
+
+async def _create_completion(messages: list, model: str, stream: bool = False,
+                             response_format: dict = None, tool_choice: str = "auto"):
+    """
+    Request a chat completion with the menu tools attached.
+
+    Every call in a conversation shares the same leading system message and
+    tool definitions, so the static prefix is eligible for prompt caching.
+    Pass tool_choice="none" to make the model answer without calling tools.
+    """
+    kwargs = dict(
+        model=model,
+        messages=messages,
+        tools=CHAT_TOOLS,
+        tool_choice=tool_choice,
+        max_tokens=4000,  # Increased for full menu listings
+    )
+    if stream:
+        kwargs["stream"] = True
+        kwargs["stream_options"] = {"include_usage": True}
+    if response_format:
+        kwargs["response_format"] = response_format
+
+    return await client.chat.completions.create(**kwargs)
+
+
+def invalidate_tool_cache() -> None:
+    """Drop all cached tool results (call after the menu database is refreshed)"""
+    global CACHE_EPOCH
+    CACHE_EPOCH += 1
+
+
 def execute_tool_call(tool_name: str, arguments: dict) -> str:
     """Execute a tool call and return the result as a string"""
     if tool_name not in TOOL_FUNCTIONS:
-        return json.dumps({"error": f"Unknown tool: {tool_name}"})
+        return orjson.dumps({"error": f"Unknown tool: {tool_name}"}).decode()
+
+    cacheable = tool_name not in _UNCACHED_TOOLS
+    if cacheable:
+        # Include today's date so "today's hours" in results never outlive the day
+        key = (CACHE_EPOCH, datetime.now(EST).date(), tool_name, orjson.dumps(arguments, option=orjson.OPT_SORT_KEYS))
+        with _TOOL_CACHE_LOCK:
+            cached = _TOOL_CACHE.get(key)
+        if cached is not None:
+            return cached
 
     try:
         func = TOOL_FUNCTIONS[tool_name]
-        result = func(**arguments)
-        return json.dumps(result, default=str)
+        result = orjson.dumps(func(**arguments), default=str).decode()
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return orjson.dumps({"error": str(e)}).decode()
+
+    if cacheable:
+        with _TOOL_CACHE_LOCK:
+            _TOOL_CACHE[key] = result
+    return result
 
 
-def get_recommendation(user_query: str, model: str = "gpt-4o-mini", history: list = None) -> str:
+async def execute_tool_calls(calls: list[tuple[str, str]]) -> list[str]:
     """
-    Get an AI-powered meal recommendation using function calling.
+    Execute several tool calls concurrently.
+
+    The tools are blocking SQLite lookups, so they run on the shared thread
+    pool and the event loop stays free while they work.
 
     Args:
-        user_query: Natural language query from user
-        model: OpenAI model to use
-        history: Previous conversation messages [{"role": "user/assistant", "content": "..."}]
+        calls: (tool_name, raw JSON arguments) pairs from one assistant turn
 
     Returns:
-        Natural language recommendation
+        Tool results as strings, in the same order as the calls
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_TOOL_EXECUTOR, execute_tool_call, tool_name, orjson.loads(arguments))
+        for tool_name, arguments in calls
+    ))
+
+
+def _context_message() -> dict:
     """
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    Preloaded tool output (current time, locations) sent right after the
+    system prompt, so the model doesn't spend round-trips asking for it.
+    Kept out of SYSTEM_PROMPT to preserve the cacheable prefix.
+    """
+    now = get_current_time()
+    week_part = "weekend" if now["is_weekend"] else "weekday"
+    return {
+        "role": "system",
+        "content": (
+            f"Current time: {now['day_of_week']}, {now['date']} at {now['current_time']} ({week_part}, "
+            f"day type for hours: {now['day_type']}).\n"
+            f"Dining locations in the database: {', '.join(list_locations())}."
+        )
+    }
+
+
+def _build_messages(user_query: str, history: list = None) -> list:
+    """Build the message list for a chat completion: system prompt, context, history, then the query"""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, _context_message()]
 
     # Add conversation history if provided (limit to last 10 messages to save tokens)
     if history:
@@ -235,72 +364,223 @@ def get_recommendation(user_query: str, model: str = "gpt-4o-mini", history: lis
     # Add current user message
     messages.append({"role": "user", "content": user_query})
 
-    # First call - LLM decides what tools to use
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        tools=TOOL_DEFINITIONS,
-        tool_choice="auto",
-        max_tokens=4000  # Increased for full menu listings
-    )
+    return messages
+
 
-    assistant_message = response.choices[0].message
+async def get_recommendation(user_query: str, model: str = "gpt-4o-mini", history: list = None) -> str:
+    """
+    Get an AI-powered meal recommendation using function calling.
+
+    Args:
+        user_query: Natural language query from user
+        model: OpenAI model to use
+        history: Previous conversation messages [{"role": "user/assistant", "content": "..."}]
+
+    Returns:
+        Natural language recommendation
+    """
+    messages = _build_messages(user_query, history)
+    return await _run_conversation(messages, model)
+
+
+async def _run_conversation(messages: list, model: str, response_format: dict = None) -> str:
+    """Run the tool-calling loop on a prepared message list and return the final answer"""
+    tokens_used = 0
+
+    for round_num in range(MAX_TOOL_ROUNDS):
+        # After a few rounds the model has enough context - make it answer
+        tool_choice = "none" if round_num >= FORCE_ANSWER_AFTER else "auto"
+        response = await _create_completion(messages, model, response_format=response_format, tool_choice=tool_choice)
+        tokens_used += _log_usage(response.usage)
+
+        assistant_message = response.choices[0].message
+
+        # No tool calls requested - this is the final answer
+        if not assistant_message.tool_calls:
+            return assistant_message.content
+
+        if tokens_used > TOKEN_BUDGET:
+            break
 
-    # Check if LLM wants to call tools
-    while assistant_message.tool_calls:
         # Add assistant's message with tool calls
         messages.append(assistant_message)
 
-        # Execute each tool call
-        for tool_call in assistant_message.tool_calls:
-            tool_name = tool_call.function.name
-            arguments = json.loads(tool_call.function.arguments)
+        # Execute the tool calls concurrently - they are independent DB lookups
+        results = await execute_tool_calls([
+            (tool_call.function.name, tool_call.function.arguments)
+            for tool_call in assistant_message.tool_calls
+        ])
 
-            # Execute the tool
-            result = execute_tool_call(tool_name, arguments)
-
-            # Add tool result to messages
+        # Add tool results to messages
+        for tool_call, result in zip(assistant_message.tool_calls, results):
             messages.append({
                 "role": "tool",
                 "tool_call_id": tool_call.id,
                 "content": result
             })
 
-        # Get next response (may have more tool calls or final answer)
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=TOOL_DEFINITIONS,
-            tool_choice="auto",
-            max_tokens=4000  # Increased for full menu listings
-        )
+    logger.warning("Tool-calling loop stopped after %d rounds (%d tokens)", round_num + 1, tokens_used)
+    return FALLBACK_RESPONSE
 
-        assistant_message = response.choices[0].message
 
-    # Return the final text response
-    return assistant_message.content
+async def get_batch_recommendations(queries: list[str], model: str = "gpt-4o-mini") -> list[str]:
+    """
+    Answer several independent queries with a single conversation.
 
+    All queries go into one user message and the model returns a JSON list
+    with one recommendation per query, so N requests share one set of
+    completion round-trips (and one copy of the system prompt) instead of N.
 
-def chat():
-    """Interactive chat mode for testing"""
-    print("=" * 60)
-    print("MenuMap AI Coach (with Function Calling)")
-    print("Type your food request, or 'quit' to exit")
-    print("=" * 60)
+    Args:
+        queries: Natural language queries from the user
+        model: OpenAI model to use
 
+    Returns:
+        One recommendation per query, in the same order
+    """
+    numbered = "\n".join(f"{i}) {query}" for i, query in enumerate(queries, 1))
+    user_message = (
+        "Answer each of the numbered requests below independently. Respond with a JSON object "
+        '{"results": [{"idx": <request number>, "recommendation": "<your answer>"}]} '
+        "containing one entry per request.\n\n"
+        f"Requests:\n{numbered}"
+    )
+
+    messages = _build_messages(user_message)
+    content = await _run_conversation(messages, model, response_format={"type": "json_object"})
+
+    # content is None when the model refuses, which orjson rejects with a TypeError
+    try:
+        parsed = orjson.loads(content)
+    except (orjson.JSONDecodeError, TypeError):
+        logger.warning("Batch reply was not valid JSON; answering with the fallback message")
+        parsed = {}
+    results = parsed.get("results") if isinstance(parsed, dict) else None
+    if not isinstance(results, list):
+        results = []
+
+    by_idx = {}
+    for entry in results:
+        if isinstance(entry, dict) and "idx" in entry and entry.get("recommendation"):
+            by_idx[str(entry["idx"])] = str(entry["recommendation"])
+
+    # Queries the model skipped (or a malformed reply) get the fallback message
+    return [by_idx.get(str(i), FALLBACK_RESPONSE) for i in range(1, len(queries) + 1)]
+
+
+async def get_recommendation_stream(user_query: str, model: str = "gpt-4o-mini", history: list = None):
+    """
+    Stream an AI-powered meal recommendation token by token.
+
+    Same tool-calling flow as get_recommendation, but every completion is
+    requested with stream=True. Tool call deltas are accumulated until the
+    model finishes with "tool_calls", the tools are executed, and a new
+    streamed completion is started with their results.
+
+    Args:
+        user_query: Natural language query from user
+        model: OpenAI model to use
+        history: Previous conversation messages [{"role": "user/assistant", "content": "..."}]
+
+    Yields:
+        Text fragments of the final recommendation as they are generated
+    """
+    messages = _build_messages(user_query, history)
+    tokens_used = 0
+
+    for round_num in range(MAX_TOOL_ROUNDS):
+        tool_choice = "none" if round_num >= FORCE_ANSWER_AFTER else "auto"
+        stream = await _create_completion(messages, model, stream=True, tool_choice=tool_choice)
+
+        # Tool calls arrive in fragments keyed by index - stitch them back together
+        tool_calls = {}
+        finish_reason = None
+
+        async for chunk in stream:
+            # The final chunk carries usage only (stream_options include_usage)
+            if getattr(chunk, "usage", None):
+                tokens_used += _log_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+
+            if delta.content:
+                yield delta.content
+
+            for tc in delta.tool_calls or []:
+                call = tool_calls.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                if tc.id:
+                    call["id"] = tc.id
+                if tc.function:
+                    if tc.function.name:
+                        call["name"] = tc.function.name
+                    if tc.function.arguments:
+                        call["arguments"] += tc.function.arguments
+
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+
+        # No tool calls requested - the answer has been fully streamed
+        if finish_reason != "tool_calls" or not tool_calls:
+            return
+
+        if tokens_used > TOKEN_BUDGET:
+            break
+
+        calls = [tool_calls[i] for i in sorted(tool_calls)]
+
+        # Add assistant's message with tool calls
+        messages.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": call["arguments"]}
+                }
+                for call in calls
+            ]
+        })
+
+        # Execute the tool calls concurrently and add their results
+        results = await execute_tool_calls([(call["name"], call["arguments"] or "{}") for call in calls])
+        for call, result in zip(calls, results):
+            messages.append({
+                "role": "tool",
+                "tool_call_id": call["id"],
+                "content": result
+            })
+
+    logger.warning("Tool-calling loop stopped after %d rounds (%d tokens)", round_num + 1, tokens_used)
+    yield FALLBACK_RESPONSE
+
+
+async def _print_stream(query: str):
+    """Print a streamed recommendation to stdout as it arrives"""
+    async for token in get_recommendation_stream(query):
+        print(token, end="", flush=True)
+
+
+async def _chat_loop():
+    """
+    The REPL itself. It runs on one event loop for the whole session: the shared
+    AsyncOpenAI client's connection pool is bound to the loop it first ran on.
+    """
     while True:
         try:
-            query = input("\nYou: ").strip()
+            query = (await asyncio.to_thread(input, "\nYou: ")).strip()
             if query.lower() in ["quit", "exit", "q"]:
                 break
             if not query:
                 continue
 
             print("\nMenuMap: ", end="", flush=True)
-            response = get_recommendation(query)
-            print(response)
+            await _print_stream(query)
+            print()
 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError):
             break
         except Exception as e:
             print(f"Error: {e}")
@@ -308,5 +588,18 @@ def chat():
             traceback.print_exc()
 
 
+def chat():
+    """Interactive chat mode for testing"""
+    print("=" * 60)
+    print("MenuMap AI Coach (with Function Calling)")
+    print("Type your food request, or 'quit' to exit")
+    print("=" * 60)
+
+    try:
+        aio.run(_chat_loop())
+    except KeyboardInterrupt:
+        pass
+
+
 if __name__ == "__main__":
     chat()
@@ -0,0 +1,16 @@
+"""
+MenuMap - Event loop helper
+Runs the scripts' async entry points on uvloop when it is installed
+"""
+import asyncio
+try:
+    import uvloop
+except ImportError:  # optional - standard asyncio event loop
+    uvloop = None
+
+
+def run(coro):
+    """asyncio.run(coro), on a uvloop event loop if available"""
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(coro)
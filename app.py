@@ -2,18 +2,141 @@
 CampusBite - Web API
 FastAPI backend for the CampusBite web app
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse, ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse
 from pydantic import BaseModel
 from pathlib import Path
+from functools import lru_cache
+import gzip
+import hashlib
+import sqlite3
+from operator import attrgetter
+from datetime import datetime
+from cachetools import TTLCache
+import orjson
 from matcher import MenuMatcher
-from ai_coach import get_recommendation
-
-app = FastAPI(title="CampusBite", description="AI-powered campus dining assistant")
-
-# Initialize matcher
-matcher = MenuMatcher()
+from db import connect
+try:
+    import brotli
+except ImportError:  # optional - gzip only
+    brotli = None
+from ai_coach import FALLBACK_RESPONSE, get_recommendation, get_recommendation_stream, get_batch_recommendations
+from intent_router import route_query
+from tools import EST
+
+app = FastAPI(
+    title="CampusBite",
+    description="AI-powered campus dining assistant",
+    default_response_class=ORJSONResponse
+)
+
+
+@lru_cache(maxsize=1)
+def get_matcher() -> MenuMatcher:
+    """Matcher shared by all handlers in this worker, created on first request"""
+    return MenuMatcher()
+
+
+DB_PATH = Path(__file__).parent / "menumap.db"
+STATIC_DIR = Path(__file__).parent / "static"
+
+# Text assets are compressed once at startup and served in whichever encoding the client accepts
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".svg", ".json"}
+
+
+def _compress_variants(data: bytes) -> dict[str, bytes]:
+    """Encoded copies of a static asset, keyed by Content-Encoding (preferred first)"""
+    variants = {}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    variants["gzip"] = gzip.compress(data, 9)
+    return variants
+
+
+def _pick_encoding(accept_encoding: str, variants: dict[str, bytes]) -> str | None:
+    """First precompressed encoding the client accepts, or None for identity"""
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    for encoding in variants:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def _encoded_etag(etag: str, encoding: str | None) -> str:
+    """ETag of one encoding of a resource - each encoding has different bytes, so needs its own tag"""
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header lists the given ETag"""
+    if not if_none_match:
+        return False
+    return etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves precompressed copies of text assets"""
+
+    def __init__(self, directory: Path, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.variants = {
+            str(path.relative_to(directory)): _compress_variants(path.read_bytes())
+            for path in directory.rglob("*")
+            if path.suffix in COMPRESSIBLE_SUFFIXES and path.is_file()
+        }
+
+    async def get_response(self, path: str, scope) -> Response:
+        variants = self.variants.get(path)
+        if variants is None:
+            return await super().get_response(path, scope)
+
+        # The ETag depends on the negotiated encoding, so conditional requests are
+        # answered here rather than by StaticFiles against the identity file's tag
+        request_headers = Headers(scope=scope)
+        unconditional_scope = {**scope, "headers": [
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"if-none-match", b"if-modified-since")
+        ]}
+        response = await super().get_response(path, unconditional_scope)
+        if response.status_code != 200:
+            return response
+
+        encoding = None
+        if scope["method"] == "GET":
+            encoding = _pick_encoding(request_headers.get("accept-encoding", ""), variants)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["ETag"] = _encoded_etag(response.headers["etag"], encoding)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if encoding is None:
+            return response
+
+        headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+        headers["Content-Encoding"] = encoding
+        return Response(variants[encoding], headers=headers)
+
+
+# index.html doesn't change while the server runs - read it once instead of on every hit
+# (a checkout without static/ still serves the API, just not the page)
+_INDEX_PATH = STATIC_DIR / "index.html"
+_INDEX_HTML = _INDEX_PATH.read_bytes() if _INDEX_PATH.exists() else None
+_INDEX_VARIANTS = _compress_variants(_INDEX_HTML) if _INDEX_HTML is not None else {}
+_INDEX_ETAG = f'"{hashlib.md5(_INDEX_HTML).hexdigest()}"' if _INDEX_HTML is not None else None
+_INDEX_HEADERS = {"Cache-Control": "public, max-age=300", "Vary": "Accept-Encoding"}
+_db_conn: sqlite3.Connection | None = None
+
+
+def _get_db_connection() -> sqlite3.Connection:
+    """Shared SQLite connection, opened once on first use and kept for the process lifetime"""
+    global _db_conn
+    if _db_conn is None:
+        _db_conn = connect(DB_PATH, check_same_thread=False)
+    return _db_conn
 
 
 class SearchRequest(BaseModel):
@@ -35,6 +158,11 @@ class MenuItem(BaseModel):
     match_reasons: list[str]
 
 
+# Pull every MenuItem field off a search result in one C-level call
+_MENU_ITEM_FIELDS = tuple(MenuItem.model_fields)
+_get_menu_item_fields = attrgetter(*_MENU_ITEM_FIELDS)
+
+
 class SearchResponse(BaseModel):
     query: str
     results: list[MenuItem]
@@ -42,10 +170,19 @@ class SearchResponse(BaseModel):
 
 
 @app.get("/", response_class=HTMLResponse)
-async def home():
+async def home(request: Request):
     """Serve the main app"""
-    html_path = Path(__file__).parent / "static" / "index.html"
-    return FileResponse(html_path)
+    if _INDEX_HTML is None:
+        raise HTTPException(status_code=404, detail="index.html not found")
+
+    encoding = _pick_encoding(request.headers.get("accept-encoding", ""), _INDEX_VARIANTS)
+    headers = {**_INDEX_HEADERS, "ETag": _encoded_etag(_INDEX_ETAG, encoding)}
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if encoding is None:
+        return HTMLResponse(_INDEX_HTML, headers=headers)
+    return HTMLResponse(_INDEX_VARIANTS[encoding], headers={**headers, "Content-Encoding": encoding})
 
 
 @app.post("/api/search", response_model=SearchResponse)
@@ -54,28 +191,16 @@ async def search(request: SearchRequest):
     if not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
 
-    results = matcher.search(request.query, limit=request.limit)
-
-    return SearchResponse(
-        query=request.query,
-        results=[
-            MenuItem(
-                name=r.name,
-                location=r.location,
-                period=r.period,
-                category=r.category,
-                calories=r.calories,
-                protein=r.protein,
-                carbs=r.carbs,
-                fat=r.fat,
-                dietary_tags=r.dietary_tags,
-                score=r.score,
-                match_reasons=r.match_reasons
-            )
-            for r in results
-        ],
-        total_found=len(results)
-    )
+    results = get_matcher().search(request.query, limit=request.limit)
+
+    # Results come from our own matcher, so skip re-validating them through
+    # SearchResponse and hand plain dicts straight to orjson.
+    # (SearchResponse still documents the shape in the OpenAPI schema.)
+    return ORJSONResponse({
+        "query": request.query,
+        "results": [dict(zip(_MENU_ITEM_FIELDS, values)) for values in map(_get_menu_item_fields, results)],
+        "total_found": len(results)
+    })
 
 
 class ChatMessage(BaseModel):
@@ -93,16 +218,41 @@ class ChatResponse(BaseModel):
     response: str
 
 
+# Answers to standalone questions are reused within the same hour - menus change
+# daily and answers mention what's open now, so the key includes date and hour
+_CHAT_CACHE = TTLCache(maxsize=1024, ttl=3600)
+
+
+def _chat_cache_key(request: ChatRequest) -> tuple | None:
+    """Cache key for a chat request, or None if its answer depends on the conversation"""
+    if request.history:
+        return None
+    return " ".join(request.message.lower().split()), datetime.now(EST).strftime("%Y%m%d%H")
+
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Get AI-powered meal recommendation"""
     if not request.message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
+    # Hours and location lookups are answered directly, without the AI coach
+    reply = route_query(request.message)
+    if reply is not None:
+        return ChatResponse(message=request.message, response=reply)
+
+    # One lookup: a TTLCache entry can expire between a membership test and a read
+    cache_key = _chat_cache_key(request)
+    cached = _CHAT_CACHE.get(cache_key)
+    if cached is not None:
+        return ChatResponse(message=request.message, response=cached)
+
     try:
         # Convert history to format expected by get_recommendation
         history = [{"role": msg.role, "content": msg.content} for msg in request.history]
-        response = get_recommendation(request.message, history=history)
+        response = await get_recommendation(request.message, history=history)
+        if cache_key is not None and response and response != FALLBACK_RESPONSE:
+            _CHAT_CACHE[cache_key] = response
         return ChatResponse(
             message=request.message,
             response=response
@@ -111,38 +261,96 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class CombinedRequest(BaseModel):
+    queries: list[str]
+
+
+class CombinedResponse(BaseModel):
+    results: list[ChatResponse]
+
+
+@app.post("/api/combined", response_model=CombinedResponse)
+async def combined(request: CombinedRequest):
+    """Get recommendations for several queries with one batched AI conversation"""
+    queries = [q for q in request.queries if q.strip()]
+    if not queries:
+        raise HTTPException(status_code=400, detail="Queries cannot be empty")
+    if len(queries) > 10:
+        raise HTTPException(status_code=400, detail="At most 10 queries per request")
+
+    try:
+        responses = await get_batch_recommendations(queries)
+        return CombinedResponse(results=[
+            ChatResponse(message=query, response=response)
+            for query, response in zip(queries, responses)
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream an AI-powered meal recommendation as server-sent events"""
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    history = [{"role": msg.role, "content": msg.content} for msg in request.history]
+
+    reply = route_query(request.message)
+    cache_key = _chat_cache_key(request)
+    if reply is None:
+        reply = _CHAT_CACHE.get(cache_key)
+
+    async def event_stream():
+        if reply is not None:
+            yield f"data: {orjson.dumps({'delta': reply}).decode()}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+        try:
+            tokens = []
+            async for token in get_recommendation_stream(request.message, history=history):
+                tokens.append(token)
+                yield f"data: {orjson.dumps({'delta': token}).decode()}\n\n"
+            response = "".join(tokens)
+            if cache_key is not None and response and response != FALLBACK_RESPONSE:
+                _CHAT_CACHE[cache_key] = response
+        except Exception as e:
+            yield f"data: {orjson.dumps({'error': str(e)}).decode()}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/stats")
 async def stats():
     """Get menu statistics"""
-    return matcher.get_stats()
+    return get_matcher().get_stats()
 
 
 @app.get("/api/debug")
 async def debug():
     """Debug endpoint to check database and environment"""
     import os
-    from pathlib import Path
-
-    db_path = Path(__file__).parent / "menumap.db"
 
     result = {
-        "db_exists": db_path.exists(),
-        "db_path": str(db_path),
+        "db_exists": DB_PATH.exists(),
+        "db_path": str(DB_PATH),
         "openai_key_set": bool(os.environ.get("OPENAI_API_KEY")),
         "openai_key_prefix": os.environ.get("OPENAI_API_KEY", "")[:10] + "..." if os.environ.get("OPENAI_API_KEY") else None,
     }
 
     # Test database query
-    if db_path.exists():
+    if DB_PATH.exists():
         try:
-            import sqlite3
-            conn = sqlite3.connect(db_path)
-            c = conn.cursor()
+            c = _get_db_connection().cursor()
             c.execute("SELECT COUNT(*) FROM menu_items")
             result["db_item_count"] = c.fetchone()[0]
             c.execute("SELECT MAX(date) FROM menu_items")
             result["db_latest_date"] = c.fetchone()[0]
-            conn.close()
             result["db_status"] = "OK"
         except Exception as e:
             result["db_status"] = f"ERROR: {str(e)}"
@@ -153,15 +361,23 @@ async def debug():
 @app.get("/api/locations")
 async def locations():
     """Get all dining locations"""
-    return {"locations": matcher.get_locations()}
+    return {"locations": get_matcher().get_locations()}
 
 
 # Serve static files
-static_path = Path(__file__).parent / "static"
-if static_path.exists():
-    app.mount("/static", StaticFiles(directory=static_path), name="static")
+if STATIC_DIR.exists():
+    app.mount("/static", PrecompressedStaticFiles(directory=STATIC_DIR), name="static")
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers need an import string; each one builds its own matcher and DB connection
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=os.cpu_count(),
+        loop="uvloop",
+        http="httptools"
+    )
@@ -0,0 +1,180 @@
+"""
+MenuMap - Database helpers
+Connection setup, dietary tag encoding and the full-text search index
+shared by the scraper and the matcher
+"""
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent / "menumap.db"
+
+# Dietary tags the scraper recognises, as bits of menu_items.dietary_mask.
+# dietary_tags keeps the comma-joined names for display.
+DIETARY_BITS = {
+    "Vegan": 1,
+    "Vegetarian": 2,
+    "Avoiding Gluten": 4,
+    "Halal": 8,
+    "Kosher": 16,
+}
+
+
+def dietary_mask(tags) -> int:
+    """Bitmask of the known dietary tags among tags"""
+    mask = 0
+    for tag in tags:
+        mask |= DIETARY_BITS.get(tag, 0)
+    return mask
+
+# External-content FTS5 index over menu_items, kept in sync by triggers.
+# The trigram tokenizer makes MATCH a case-insensitive substring search, the same
+# semantics as the matcher's `keyword in name.lower()` checks.
+# Separate statements (not one script) so they run inside ensure_schema's transaction.
+SEARCH_INDEX_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS menu_items_fts USING fts5(
+        name, description, category, dietary_tags,
+        content='menu_items', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menu_items_fts_ai AFTER INSERT ON menu_items BEGIN
+        INSERT INTO menu_items_fts(rowid, name, description, category, dietary_tags)
+        VALUES (new.id, new.name, new.description, new.category, new.dietary_tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menu_items_fts_ad AFTER DELETE ON menu_items BEGIN
+        INSERT INTO menu_items_fts(menu_items_fts, rowid, name, description, category, dietary_tags)
+        VALUES ('delete', old.id, old.name, old.description, old.category, old.dietary_tags);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS menu_items_fts_au
+    AFTER UPDATE OF name, description, category, dietary_tags ON menu_items BEGIN
+        INSERT INTO menu_items_fts(menu_items_fts, rowid, name, description, category, dietary_tags)
+        VALUES ('delete', old.id, old.name, old.description, old.category, old.dietary_tags);
+        INSERT INTO menu_items_fts(rowid, name, description, category, dietary_tags)
+        VALUES (new.id, new.name, new.description, new.category, new.dietary_tags);
+    END
+    """,
+)
+
+# Indexes ensure_schema maintains (name -> definition)
+SEARCH_INDEXES = {
+    # location_id rides along so the join to locations is resolved from the index entries
+    "idx_menu_date_period_loc": "CREATE INDEX IF NOT EXISTS idx_menu_date_period_loc ON menu_items(date, period, location_id)",
+    # The tools' high-protein searches read the day in protein order and stop at the limit
+    "idx_menu_date_protein": "CREATE INDEX IF NOT EXISTS idx_menu_date_protein ON menu_items(date, protein)",
+}
+
+
+def connect(
+    db_path: Path = DB_PATH, check_same_thread: bool = True, cached_statements: int = 128
+) -> sqlite3.Connection:
+    """
+    Open the menu database with the settings shared by every reader and writer.
+
+    Connections are meant to be kept open: WAL lets readers run while the scraper
+    writes, and mmap plus a larger page cache keep repeat reads in memory.
+    recursive_triggers makes INSERT OR REPLACE fire the delete trigger for the
+    row it replaces, which keeps the search index in sync. cached_statements sizes
+    the per-connection cache of compiled statements.
+    """
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, cached_statements=cached_statements)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+    conn.execute("PRAGMA temp_store=MEMORY")  # sorts and temp b-trees stay off disk
+    conn.execute("PRAGMA recursive_triggers=ON")
+    return conn
+
+
+def _schema_is_current(conn: sqlite3.Connection) -> bool:
+    """Whether ensure_schema has nothing to do (read-only check)"""
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(menu_items)")}
+    return (
+        "dietary_mask" in columns
+        and "idx_menu_date_period" not in names
+        and names.issuperset(SEARCH_INDEXES)
+        and "sqlite_stat1" in names
+        and "menu_items_fts" in names
+    )
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """
+    Bring an existing menu database up to what the matcher relies on:
+    the dietary_mask column, the (date, period, location_id) and (date, protein)
+    indexes for searches, planner statistics, and the full-text search index. New
+    columns and indexes are backfilled from menu_items the first time they are created.
+
+    Safe to call from every process and thread: an up-to-date database is only read,
+    and otherwise the migration runs in one BEGIN IMMEDIATE transaction that re-checks
+    the schema after taking the write lock, so concurrent callers wait for the first
+    one and then find nothing left to do.
+    """
+    if _schema_is_current(conn):
+        return
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _migrate_schema(conn)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _migrate_schema(conn: sqlite3.Connection) -> None:
+    """ensure_schema's changes; runs inside its write transaction"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(menu_items)")}
+    if "dietary_mask" not in columns:
+        conn.execute("ALTER TABLE menu_items ADD COLUMN dietary_mask INTEGER")
+        # Same encoding as dietary_mask(), computed from the comma-joined tags
+        conn.execute("UPDATE menu_items SET dietary_mask = " + " + ".join(
+            f"(CASE WHEN instr(',' || coalesce(dietary_tags, '') || ',', ',{tag},') THEN {bit} ELSE 0 END)"
+            for tag, bit in DIETARY_BITS.items()
+        ))
+
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+
+    conn.execute("DROP INDEX IF EXISTS idx_menu_date_period")
+    for ddl in SEARCH_INDEXES.values():
+        conn.execute(ddl)
+
+    # Without sqlite_stat1 the planner guesses and drives the tools' searches off
+    # idx_menu_date (one whole day, then a sort); with it, a location filter is
+    # looked up through the (location_id, date, ...) unique index instead.
+    # A newly created index has no statistics either.
+    if "sqlite_stat1" not in names or not names.issuperset(SEARCH_INDEXES):
+        conn.execute("ANALYZE")
+
+    if "menu_items_fts" not in names:
+        for statement in SEARCH_INDEX_SCHEMA:
+            conn.execute(statement)
+        conn.execute("INSERT INTO menu_items_fts(menu_items_fts) VALUES ('rebuild')")
+
+
+def analyze(conn: sqlite3.Connection) -> None:
+    """Refresh the query planner's statistics (after the scraper loads new menus)"""
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def fts_phrase_query(phrases: list[str], columns: tuple[str, ...] = ("name", "description")) -> str:
+    """Build an FTS5 MATCH expression for any of the phrases within the given columns"""
+    quoted = " OR ".join('"' + phrase.replace('"', '""') + '"' for phrase in phrases)
+    return "{" + " ".join(columns) + "} : (" + quoted + ")"
+
+
+if __name__ == "__main__":
+    # Deploy-time migration (Procfile release phase), so web workers find it done
+    conn = connect()
+    ensure_schema(conn)
+    conn.close()
+    print(f"Schema up to date: {DB_PATH}")
@@ -1,7 +1,9 @@
 """
 Debug the dineoncampus API response
 """
-import requests
+import asyncio
+import httpx
+import aio
 
 API_URL = "https://api.dineoncampus.com/v1/"
 
@@ -11,13 +13,29 @@ endpoints = [
     "sites/public",
 ]
 
-for endpoint in endpoints:
-    url = API_URL + endpoint
-    print(f"\n{'='*60}")
-    print(f"Testing: {url}")
-    print('='*60)
 
-    resp = requests.get(url)
-    print(f"Status: {resp.status_code}")
-    print(f"Headers: {dict(resp.headers)[:200] if resp.headers else 'None'}")
-    print(f"Content (first 500 chars): {resp.text[:500]}")
+async def main():
+    # One HTTP/2 client: every request shares a single connection and TLS session
+    async with httpx.AsyncClient(http2=True, timeout=10.0) as client:
+        responses = await asyncio.gather(
+            *(client.get(API_URL + endpoint) for endpoint in endpoints),
+            return_exceptions=True
+        )
+
+    for endpoint, resp in zip(endpoints, responses):
+        url = API_URL + endpoint
+        print(f"\n{'='*60}")
+        print(f"Testing: {url}")
+        print('='*60)
+
+        if isinstance(resp, Exception):
+            print(f"Error: {resp}")
+            continue
+
+        print(f"Status: {resp.status_code} ({resp.http_version})")
+        print(f"Headers: {str(dict(resp.headers))[:200] if resp.headers else 'None'}")
+        print(f"Content (first 500 chars): {resp.text[:500]}")
+
+
+if __name__ == "__main__":
+    aio.run(main())
@@ -0,0 +1,125 @@
+"""
+CampusBite - Intent Router
+Answers trivial lookups (a dining hall's hours, the list of dining halls)
+straight from the tools, so they skip the OpenAI round-trip entirely
+"""
+import re
+from tools import get_location_hours, is_location_open_now, list_locations
+
+# What users actually type -> location name used in DINING_HOURS
+LOCATION_ALIASES = {
+    "downstein": "NYU EATS at Downstein",
+    "third north": "NYU EATS at Third North",
+    "3rd north": "NYU EATS at Third North",
+    "lipton": "NYU EATS at Lipton",
+    "kimmel": "The Marketplace at Kimmel",
+    "marketplace": "The Marketplace at Kimmel",
+    "palladium": "Palladium",
+    "palladium's": "Palladium",
+    "crave": "Crave NYU",
+    "upstein": "Upstein",
+    "kosher eatery": "Kosher Eatery",
+    "jasper kane": "Jasper Kane Cafe",
+    "starbucks": "Starbucks",
+    "dunkin": "Dunkin'",
+    "dunkin'": "Dunkin'",
+    "u-hall": "U-Hall Commons Cafe",
+    "uhall": "U-Hall Commons Cafe",
+    "peet's": "Peet's Coffee",
+    "peets": "Peet's Coffee",
+    "flavor lab": "Flavor Lab by NYU Eats",
+}
+
+# Longest alias first so "third north" wins over any shorter overlap
+_LOCATION_RE = re.compile(
+    r"(?<![\w'-])(" + "|".join(re.escape(a) for a in sorted(LOCATION_ALIASES, key=len, reverse=True)) + r")(?![\w'-])"
+)
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+HOURS_WORDS = {"hours", "hour", "open", "opens", "opening", "close", "closes", "closing", "closed"}
+LOCATIONS_WORDS = {"locations", "location", "halls", "hall", "places"}
+# An hours question asks "is it open right now?" when it is a yes/no question
+# ("is lipton open") or is about the present ("open now", "still open");
+# "when/what time does lipton open" asks for the schedule instead
+OPEN_STATE_WORDS = {"open", "closed"}
+OPEN_NOW_WORDS = {"now", "currently", "still"}
+YES_NO_WORDS = {"is", "are"}
+
+# Filler that may surround a lookup; any other word means the query needs the AI coach
+_FILLER_WORDS = {
+    "what", "what's", "whats", "when", "which", "where", "how", "is", "are", "does", "do",
+    "the", "a", "at", "for", "of", "on", "in", "it", "its", "there", "today", "tonight",
+    "now", "currently", "right", "still", "until", "till", "late", "time", "times",
+    "dining", "nyu", "eats", "campus", "all", "list", "show", "me", "tell", "please", "available",
+}
+
+
+def classify(query: str) -> tuple[str, str | None]:
+    """
+    Classify a chat message.
+
+    Returns:
+        ("open_now", location) for whether a single location is open right now,
+        ("hours", location) for its hours, ("locations", None) for the list of
+        dining halls, or ("chat", None) for everything else
+    """
+    text = query.lower().strip().rstrip("?!.")
+
+    locations = {LOCATION_ALIASES[m] for m in _LOCATION_RE.findall(text)}
+    words = set(_WORD_RE.findall(_LOCATION_RE.sub(" ", text)))
+    if not words or words - _FILLER_WORDS - HOURS_WORDS - LOCATIONS_WORDS:
+        return "chat", None
+
+    if len(locations) == 1 and words & HOURS_WORDS and not words & LOCATIONS_WORDS:
+        asks_yes_no = text.split(maxsplit=1)[0] in YES_NO_WORDS
+        if words & OPEN_STATE_WORDS and (asks_yes_no or words & OPEN_NOW_WORDS):
+            return "open_now", locations.pop()
+        return "hours", locations.pop()
+    if not locations and words & LOCATIONS_WORDS and not words & HOURS_WORDS:
+        return "locations", None
+    return "chat", None
+
+
+def _format_hours(location: str) -> str:
+    return _format_hours_info(get_location_hours(location))
+
+
+def _format_hours_info(info: dict) -> str:
+    if not info["hours"]:
+        return f"**{info['location']}** is closed today ({info['today']}). {info['note']}"
+
+    lines = [f"**{info['location']}** hours today ({info['today']}):"]
+    for period, (start, end) in info["hours"].items():
+        lines.append(f"- {period}: {start} - {end}")
+    lines.append(info["note"])
+    return "\n".join(lines)
+
+
+def _format_open_now(location: str) -> str:
+    info = get_location_hours(location)
+    state = "open" if is_location_open_now(location) else "closed"
+    status = f"**{info['location']}** is {state} right now ({info['today']}, {info['current_time']})."
+    return status + "\n\n" + _format_hours_info(info)
+
+
+def _format_locations() -> str:
+    lines = ["Here are the dining locations I know about:"]
+    lines.extend(f"- {name}" for name in list_locations())
+    return "\n".join(lines)
+
+
+def route_query(query: str) -> str | None:
+    """
+    Answer a trivial lookup directly.
+
+    Returns:
+        The templated reply, or None if the query should go to the AI coach
+    """
+    intent, location = classify(query)
+    if intent == "open_now":
+        return _format_open_now(location)
+    if intent == "hours":
+        return _format_hours(location)
+    if intent == "locations":
+        return _format_locations()
+    return None
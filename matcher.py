@@ -4,10 +4,28 @@ Takes natural language prompts and finds matching menu items
 """
 import sqlite3
 import re
+from itertools import chain
 from pathlib import Path
 from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from db import DB_PATH, DIETARY_BITS, connect, ensure_schema, fts_phrase_query
 
-DB_PATH = Path(__file__).parent / "menumap.db"
+
+# Specific targets in a prompt, e.g. "under 500 calories" / "40g of protein"
+CALORIE_LIMIT_RE = re.compile(r"under (\d+)\s*(?:cal|calories)")
+PROTEIN_TARGET_RE = re.compile(r"(\d+)\s*(?:g|grams?)?\s*(?:of\s*)?protein")
+
+# Longer prompts are parsed without caching to bound the cache's memory
+MAX_CACHED_PROMPT_LENGTH = 200
+
+# menu_items columns a nutrition goal may compare against
+NUTRIENT_COLUMNS = {"calories", "protein", "carbs", "fat"}
+
+# Search SQL only varies with the shape of the parsed prompt (values are bound
+# parameters), and sqlite3 keeps each distinct statement compiled. Room for every
+# shape seen in practice means a repeat shape skips parsing and planning.
+SEARCH_STATEMENT_CACHE_SIZE = 512
 
 
 @dataclass
@@ -73,16 +91,45 @@ class MenuMatcher:
         r"high calorie|bulking|gains": {"calories": (">=", 600)},
     }
 
+    PERIODS = {"breakfast": "Breakfast", "lunch": "Lunch", "dinner": "Dinner"}
+
+    # Food keywords in match order (duplicates across categories kept), and every
+    # distinct literal phrase above so each one is looked for only once per prompt
+    _KEYWORD_ORDER = tuple(chain.from_iterable(FOOD_KEYWORDS.values()))
+    _LITERALS = tuple(dict.fromkeys(chain(_KEYWORD_ORDER, DIETARY_PATTERNS, PERIODS)))
+
+    _NUTRITION_RES = [(re.compile(pattern), filters) for pattern, filters in NUTRITION_PATTERNS.items()]
+
     def __init__(self, db_path: Path = DB_PATH):
         self.db_path = db_path
+        # One read connection for the matcher's lifetime (shared across request threads;
+        # the matcher never writes after ensure_schema)
+        self._conn = connect(db_path, check_same_thread=False, cached_statements=SEARCH_STATEMENT_CACHE_SIZE)
+        self._conn.row_factory = sqlite3.Row
+        ensure_schema(self._conn)
 
-    def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+    def _get_connection(self) -> sqlite3.Connection:
+        return self._conn
+
+    def _parse_prompt(self, prompt: str) -> MappingProxyType:
+        """
+        Parse user prompt into structured query parameters.
 
-    def _parse_prompt(self, prompt: str) -> dict:
-        """Parse user prompt into structured query parameters"""
+        Parsing depends only on the lowercased prompt, so results are cached per
+        prompt; the returned mapping is shared between calls and read-only.
+        """
         prompt_lower = prompt.lower()
+        if len(prompt_lower) > MAX_CACHED_PROMPT_LENGTH:
+            return self._parse_lowered(prompt_lower)
+        return self._parse_lowered_cached(prompt_lower)
+
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def _parse_lowered_cached(cls, prompt_lower: str) -> MappingProxyType:
+        return cls._parse_lowered(prompt_lower)
 
+    @classmethod
+    def _parse_lowered(cls, prompt_lower: str) -> MappingProxyType:
         parsed = {
             "food_keywords": [],
             "dietary_filters": [],
@@ -91,80 +138,116 @@ class MenuMatcher:
             "location_preference": None,
         }
 
+        # Find every keyword, dietary pattern and period word in one pass
+        found = {phrase for phrase in cls._LITERALS if phrase in prompt_lower}
+
         # Extract food keywords
-        for category, keywords in self.FOOD_KEYWORDS.items():
-            for kw in keywords:
-                if kw in prompt_lower:
-                    parsed["food_keywords"].append(kw)
+        parsed["food_keywords"] = [kw for kw in cls._KEYWORD_ORDER if kw in found]
 
         # Extract dietary restrictions
-        for pattern, tag in self.DIETARY_PATTERNS.items():
-            if pattern in prompt_lower:
+        for pattern, tag in cls.DIETARY_PATTERNS.items():
+            if pattern in found:
                 parsed["dietary_filters"].append(tag)
 
         # Extract meal period
-        if "breakfast" in prompt_lower:
-            parsed["period"] = "Breakfast"
-        elif "lunch" in prompt_lower:
-            parsed["period"] = "Lunch"
-        elif "dinner" in prompt_lower:
-            parsed["period"] = "Dinner"
+        for word, period in cls.PERIODS.items():
+            if word in found:
+                parsed["period"] = period
+                break
 
         # Extract nutritional goals
-        for pattern, filters in self.NUTRITION_PATTERNS.items():
-            if re.search(pattern, prompt_lower):
+        for pattern, filters in cls._NUTRITION_RES:
+            if pattern.search(prompt_lower):
                 parsed["nutrition_filters"].update(filters)
 
         # Extract specific calorie limit
-        cal_match = re.search(r"under (\d+)\s*(?:cal|calories)", prompt_lower)
+        cal_match = CALORIE_LIMIT_RE.search(prompt_lower)
         if cal_match:
             parsed["nutrition_filters"]["calories"] = ("<=", int(cal_match.group(1)))
 
         # Extract protein target
-        protein_match = re.search(r"(\d+)\s*(?:g|grams?)?\s*(?:of\s*)?protein", prompt_lower)
+        protein_match = PROTEIN_TARGET_RE.search(prompt_lower)
         if protein_match:
             parsed["nutrition_filters"]["protein"] = (">=", int(protein_match.group(1)))
 
-        return parsed
+        # Freeze so a cached parse can't be changed by one caller under another
+        parsed["food_keywords"] = tuple(parsed["food_keywords"])
+        parsed["dietary_filters"] = tuple(parsed["dietary_filters"])
+        parsed["nutrition_filters"] = MappingProxyType(parsed["nutrition_filters"])
+        return MappingProxyType(parsed)
 
-    def _score_item(self, item: dict, parsed: dict) -> tuple[float, list[str]]:
-        """Calculate match score and reasons for a menu item"""
-        score = 0.0
+    def _match_reasons(self, item: dict, parsed: MappingProxyType) -> list[str]:
+        """Explain which criteria a scored menu item matched (mirrors the SQL score terms)"""
         reasons = []
 
         item_name_lower = item["name"].lower()
         item_desc_lower = (item.get("description") or "").lower()
         item_tags = (item.get("dietary_tags") or "").split(",")
 
-        # Food keyword matching (0-40 points)
-        for kw in parsed["food_keywords"]:
-            if kw in item_name_lower or kw in item_desc_lower:
-                score += 20
-                reasons.append(f"matches '{kw}'")
+        # Food keyword matching - only rows the search index matched can hit
+        if item.get("keyword_rank") is not None:
+            for kw in parsed["food_keywords"]:
+                if kw in item_name_lower or kw in item_desc_lower:
+                    reasons.append(f"matches '{kw}'")
 
-        # Dietary filter matching (0-30 points)
+        # Dietary filter matching
         for diet_tag in parsed["dietary_filters"]:
-            if diet_tag in item_tags:
-                score += 30
+            if diet_tag in DIETARY_BITS:
+                if item["dietary_mask"] & DIETARY_BITS[diet_tag]:
+                    reasons.append(diet_tag)
+            elif diet_tag in item_tags:
                 reasons.append(diet_tag)
 
-        # Period matching (0-10 points)
+        # Period matching
         if parsed["period"] and item.get("period") == parsed["period"]:
-            score += 10
             reasons.append(f"{parsed['period']} item")
 
-        # Nutritional goals (0-20 points)
+        # Nutritional goals
         for nutrient, (op, target) in parsed.get("nutrition_filters", {}).items():
             value = item.get(nutrient)
             if value is not None:
-                if op == ">=" and value >= target:
-                    score += 20
-                    reasons.append(f"{nutrient}: {value}")
-                elif op == "<=" and value <= target:
-                    score += 20
+                if (op == ">=" and value >= target) or (op == "<=" and value <= target):
                     reasons.append(f"{nutrient}: {value}")
 
-        return score, reasons
+        return reasons
+
+    def _score_sql(self, parsed: MappingProxyType) -> tuple[str, list]:
+        """
+        Build the SQL score expression for a parsed prompt.
+
+        Each criterion is a CASE term: 20 per food keyword in the name or description,
+        30 per dietary tag, 10 for the meal period and 20 per nutrition goal met.
+        """
+        terms = []
+        params = []
+
+        for kw in parsed["food_keywords"]:
+            terms.append(
+                "CASE WHEN fts.id IS NOT NULL AND "
+                "(instr(lower(mi.name), ?) OR instr(lower(mi.description), ?)) THEN 20 ELSE 0 END"
+            )
+            params += [kw, kw]
+
+        # Known tags are bits of dietary_mask; anything else is matched against the
+        # comma-separated names, wrapped in commas to match whole tags
+        for diet_tag in parsed["dietary_filters"]:
+            if diet_tag in DIETARY_BITS:
+                terms.append("CASE WHEN mi.dietary_mask & ? THEN 30 ELSE 0 END")
+                params.append(DIETARY_BITS[diet_tag])
+            else:
+                terms.append("CASE WHEN instr(',' || mi.dietary_tags || ',', ?) THEN 30 ELSE 0 END")
+                params.append(f",{diet_tag},")
+
+        # Rows are already filtered to the requested period
+        if parsed["period"]:
+            terms.append("10")
+
+        for nutrient, (op, target) in parsed["nutrition_filters"].items():
+            if nutrient in NUTRIENT_COLUMNS and op in (">=", "<="):
+                terms.append(f"CASE WHEN mi.{nutrient} {op} ? THEN 20 ELSE 0 END")
+                params.append(target)
+
+        return " + ".join(terms) or "0", params
 
     def search(self, prompt: str, limit: int = 10, date: str = None) -> list[MatchResult]:
         """
@@ -180,8 +263,13 @@ class MenuMatcher:
         """
         parsed = self._parse_prompt(prompt)
 
+        # Without dietary, period or nutrition criteria only keyword hits can score,
+        # so the search index alone decides which rows are considered
+        keywords_only = not (parsed["dietary_filters"] or parsed["period"] or parsed["nutrition_filters"])
+        if keywords_only and not parsed["food_keywords"]:
+            return []
+
         conn = self._get_connection()
-        conn.row_factory = sqlite3.Row
         c = conn.cursor()
 
         # Get the date to search
@@ -189,53 +277,87 @@ class MenuMatcher:
             c.execute("SELECT MAX(date) FROM menu_items")
             date = c.fetchone()[0]
 
-        # Build query
-        query = '''
-            SELECT
-                mi.name, mi.period, mi.category, mi.description,
-                mi.calories, mi.protein, mi.carbs, mi.fat,
-                mi.dietary_tags, mi.allergens,
-                l.name as location_name
-            FROM menu_items mi
-            JOIN locations l ON mi.location_id = l.id
-            WHERE mi.date = ?
-        '''
-        params = [date]
+        # Keyword hits come from the FTS index with their bm25 rank.
+        # MATERIALIZED runs the MATCH once instead of once per joined row.
+        if parsed["food_keywords"]:
+            keyword_cte = '''
+                WITH fts AS MATERIALIZED (
+                    SELECT rowid AS id, bm25(menu_items_fts) AS rank
+                    FROM menu_items_fts WHERE menu_items_fts MATCH ?
+                )
+            '''
+            keyword_join = "JOIN fts ON fts.id = mi.id" if keywords_only else "LEFT JOIN fts ON fts.id = mi.id"
+            keyword_rank = "fts.rank"
+            params = [fts_phrase_query(parsed["food_keywords"])]
+        else:
+            keyword_cte = keyword_join = ""
+            keyword_rank = "NULL"
+            params = []
+
+        score_sql, score_params = self._score_sql(parsed)
+        params += score_params
+        params.append(date)
 
-        # Add period filter if specified
+        # Score every candidate in SQL; only the top rows come back to Python
+        period_filter = ""
         if parsed["period"]:
-            query += " AND mi.period = ?"
+            period_filter = "AND mi.period = ?"
             params.append(parsed["period"])
+        params.append(limit)
+
+        query = f'''
+            {keyword_cte}
+            SELECT * FROM (
+                SELECT
+                    mi.id, mi.name, mi.period, mi.category,
+                    mi.calories, mi.protein, mi.carbs, mi.fat,
+                    mi.dietary_tags, mi.dietary_mask,
+                    l.name as location_name,
+                    {keyword_rank} as keyword_rank,
+                    {score_sql} as score
+                FROM menu_items mi
+                JOIN locations l ON mi.location_id = l.id
+                {keyword_join}
+                WHERE mi.date = ? {period_filter}
+            )
+            WHERE score > 0
+            ORDER BY score DESC, coalesce(keyword_rank, 0), id
+            LIMIT ?
+        '''
 
         c.execute(query, params)
         rows = c.fetchall()
-        conn.close()
 
-        # Score and rank results
+        # Descriptions only explain keyword hits, so read them for those final rows alone
+        keyword_ids = [row["id"] for row in rows if row["keyword_rank"] is not None]
+        descriptions = {}
+        if keyword_ids:
+            c.execute(
+                f"SELECT id, description FROM menu_items WHERE id IN ({','.join('?' * len(keyword_ids))})",
+                keyword_ids
+            )
+            descriptions = dict(c.fetchall())
+
+        # Ranked by SQL - just explain each match
         results = []
         for row in rows:
             item = dict(row)
-            score, reasons = self._score_item(item, parsed)
-
-            if score > 0:  # Only include items with some match
-                results.append(MatchResult(
-                    name=item["name"],
-                    location=item["location_name"],
-                    period=item["period"],
-                    category=item["category"],
-                    calories=item["calories"],
-                    protein=item["protein"],
-                    carbs=item["carbs"],
-                    fat=item["fat"],
-                    dietary_tags=item["dietary_tags"].split(",") if item["dietary_tags"] else [],
-                    score=score,
-                    match_reasons=reasons
-                ))
-
-        # Sort by score descending
-        results.sort(key=lambda x: x.score, reverse=True)
-
-        return results[:limit]
+            item["description"] = descriptions.get(item["id"])
+            results.append(MatchResult(
+                name=item["name"],
+                location=item["location_name"],
+                period=item["period"],
+                category=item["category"],
+                calories=item["calories"],
+                protein=item["protein"],
+                carbs=item["carbs"],
+                fat=item["fat"],
+                dietary_tags=item["dietary_tags"].split(",") if item["dietary_tags"] else [],
+                score=float(item["score"]),
+                match_reasons=self._match_reasons(item, parsed)
+            ))
+
+        return results
 
     def get_locations(self) -> list[str]:
         """Get all available dining locations"""
@@ -243,7 +365,6 @@ class MenuMatcher:
         c = conn.cursor()
         c.execute("SELECT name FROM locations ORDER BY name")
         locations = [row[0] for row in c.fetchall()]
-        conn.close()
         return locations
 
     def get_stats(self, date: str = None) -> dict:
@@ -268,8 +389,6 @@ class MenuMatcher:
         """, (date,))
         by_location = {row[0]: row[1] for row in c.fetchall()}
 
-        conn.close()
-
         return {
             "date": date,
             "total_items": total_items,
@@ -4,31 +4,73 @@ Fetches all menu data from NYU dining locations and stores in SQLite
 """
 import cloudscraper
 from fake_useragent import UserAgent
+import asyncio
+import aio
+import hashlib
+import orjson
 import sqlite3
+import sys
 import time
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
+from db import DIETARY_BITS, analyze, connect, dietary_mask, ensure_schema
 
 # Config
 API_BASE = "https://api.dineoncampus.com/v1/"
 NYU_SITE_NAME = "NYUeats"
-REQUEST_DELAY = 1.5  # seconds between requests
+REQUEST_DELAY = 1.5  # seconds between requests (per concurrent slot)
+MAX_CONCURRENT_REQUESTS = 4  # requests in flight at once across all locations
 DB_PATH = Path(__file__).parent / "menumap.db"
 
-# Initialize scraper
+# Initialize scraper (a requests.Session, so connections are kept alive across calls)
 scraper = cloudscraper.create_scraper()
 ua = UserAgent()
 
+# Returned by a conditional fetch() when the endpoint's response hasn't changed
+NOT_MODIFIED = object()
 
-def fetch(endpoint: str) -> dict | None:
-    """Fetch from API with Cloudflare bypass"""
+# endpoint -> (etag, last_modified, body_hash) of its last successful response,
+# loaded from and saved back to the http_cache table around each scrape
+http_cache: dict[str, tuple] = {}
+
+
+def fetch(endpoint: str, conditional: bool = False) -> dict | None:
+    """
+    Fetch from API with Cloudflare bypass.
+
+    With conditional=True the request carries the validators from the endpoint's last
+    response, and NOT_MODIFIED is returned instead of the data when the server answers
+    304 or sends back the same body as before.
+    """
     url = API_BASE + endpoint
     headers = {"User-Agent": ua.random}
 
+    cached = http_cache.get(endpoint) if conditional else None
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
     try:
         response = scraper.get(url, headers=headers, timeout=30)
+        if response.status_code == 304 and cached:
+            return NOT_MODIFIED
         if response.status_code == 200:
-            return response.json()
+            body_hash = hashlib.sha1(response.content).hexdigest() if conditional else None
+            if cached and cached[2] == body_hash:
+                return NOT_MODIFIED
+
+            # orjson decodes the raw bytes directly, well ahead of stdlib json on full-day menus
+            data = orjson.loads(response.content)
+            if conditional:
+                http_cache[endpoint] = (
+                    response.headers.get("ETag"), response.headers.get("Last-Modified"), body_hash
+                )
+            return data
         else:
             print(f"  Error {response.status_code}: {endpoint[:50]}")
             return None
@@ -39,7 +81,7 @@ def fetch(endpoint: str) -> dict | None:
 
 def init_database():
     """Create database tables if they don't exist"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     c = conn.cursor()
 
     # Locations table
@@ -78,6 +120,7 @@ def init_database():
             vitamin_c REAL,
             vitamin_a REAL,
             dietary_tags TEXT,
+            dietary_mask INTEGER,
             allergens TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (location_id) REFERENCES locations(id),
@@ -90,7 +133,8 @@ def init_database():
         ('fiber', 'REAL'), ('sugar', 'REAL'), ('saturated_fat', 'REAL'),
         ('trans_fat', 'REAL'), ('cholesterol', 'REAL'), ('sodium', 'REAL'),
         ('potassium', 'REAL'), ('calcium', 'REAL'), ('iron', 'REAL'),
-        ('vitamin_d', 'REAL'), ('vitamin_c', 'REAL'), ('vitamin_a', 'REAL')
+        ('vitamin_d', 'REAL'), ('vitamin_c', 'REAL'), ('vitamin_a', 'REAL'),
+        ('dietary_mask', 'INTEGER')
     ]
     for col_name, col_type in new_columns:
         try:
@@ -98,15 +142,40 @@ def init_database():
         except sqlite3.OperationalError:
             pass  # Column already exists
 
+    # Validators from the last response per endpoint, for conditional requests
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS http_cache (
+            endpoint TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            body_hash TEXT
+        )
+    ''')
+
     # Index for fast queries
     c.execute('CREATE INDEX IF NOT EXISTS idx_menu_date ON menu_items(date)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_menu_location ON menu_items(location_id)')
-
     conn.commit()
+
+    # Search and full-text indexes used by the matcher
+    ensure_schema(conn)
     conn.close()
     print(f"Database initialized at {DB_PATH}")
 
 
+async def fetch_async(endpoint: str, semaphore: asyncio.Semaphore, conditional: bool = False) -> dict | None:
+    """
+    fetch() on a worker thread, limited by the shared semaphore.
+
+    Each slot waits REQUEST_DELAY after its request before taking the next one,
+    so the API sees at most MAX_CONCURRENT_REQUESTS requests per REQUEST_DELAY.
+    """
+    async with semaphore:
+        result = await asyncio.to_thread(fetch, endpoint, conditional)
+        await asyncio.sleep(REQUEST_DELAY)
+    return result
+
+
 def get_site_info() -> tuple[str, list]:
     """Get NYU site ID and all dining locations"""
     print("Fetching NYU site info...")
@@ -153,9 +222,8 @@ def get_site_info() -> tuple[str, list]:
     return site_id, locations
 
 
-def save_locations(locations: list):
+def save_locations(conn: sqlite3.Connection, locations: list):
     """Save locations to database"""
-    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
 
     for loc in locations:
@@ -165,7 +233,49 @@ def save_locations(locations: list):
         ''', (loc["id"], loc["name"], loc["building"]))
 
     conn.commit()
-    conn.close()
+
+
+# API nutrient names (lowercased) -> parse_nutrients result key
+NUTRIENT_KEYS = {
+    "calories": "calories",
+    "total fat (g)": "fat",
+    "dietary fiber (g)": "fiber",
+    "sugar (g)": "sugar",
+    "saturated fat (g)": "saturated_fat",
+    "trans fat (g)": "trans_fat",
+    "cholesterol (mg)": "cholesterol",
+    "sodium (mg)": "sodium",
+    "potassium (mg)": "potassium",
+    "calcium (mg)": "calcium",
+    "iron (mg)": "iron",
+}
+
+# Names that vary in spelling or units, matched by substrings (all must appear), in order
+NUTRIENT_SUBSTRING_KEYS = [
+    (("protein", "("), "protein"),  # "Protein (g)"
+    (("total carbohydrate",), "carbs"),  # "Total Carbohydrates (g)"
+    (("vitamin d",), "vitamin_d"),
+    (("vitamin c",), "vitamin_c"),
+    (("vitamin a",), "vitamin_a"),
+]
+
+# Deletes every Latin-1 character except digits and the decimal point in one C-level pass;
+# the rare value with characters beyond the table takes the per-character path
+NUMERIC_ONLY = str.maketrans("", "", "".join(
+    chr(c) for c in range(256) if not (chr(c).isdigit() or chr(c) == ".")
+))
+
+
+@lru_cache(maxsize=None)
+def nutrient_key(name: str) -> str | None:
+    """Result key for a lowercased API nutrient name (None if we don't track it)"""
+    key = NUTRIENT_KEYS.get(name)
+    if key is not None:
+        return key
+    for substrings, key in NUTRIENT_SUBSTRING_KEYS:
+        if all(sub in name for sub in substrings):
+            return key
+    return None
 
 
 def parse_nutrients(nutrients: list) -> dict:
@@ -178,7 +288,11 @@ def parse_nutrients(nutrients: list) -> dict:
     }
 
     for n in nutrients:
-        name = n.get("name", "").lower()
+        # Match nutrient names (API returns "Protein (g)", "Total Fat (g)", etc.)
+        key = nutrient_key(n.get("name", "").lower())
+        if key is None:
+            continue
+
         # Use value_numeric if available, otherwise value
         value = n.get("value_numeric") or n.get("value")
 
@@ -190,7 +304,9 @@ def parse_nutrients(nutrients: list) -> dict:
             if value == "-" or value == "":
                 continue
             # Remove non-numeric chars except decimal point
-            value = ''.join(c for c in value if c.isdigit() or c == '.')
+            value = value.translate(NUMERIC_ONLY)
+            if not value.isascii():
+                value = "".join(c for c in value if c.isdigit() or c == ".")
             if value:
                 try:
                     value = float(value)
@@ -200,165 +316,174 @@ def parse_nutrients(nutrients: list) -> dict:
         if value is None:
             continue
 
-        # Match nutrient names (API returns "Protein (g)", "Total Fat (g)", etc.)
-        if name == "calories":
-            result["calories"] = int(value)
-        elif "protein" in name and "(" in name:  # "Protein (g)"
-            result["protein"] = value
-        elif "total carbohydrate" in name:  # "Total Carbohydrates (g)"
-            result["carbs"] = value
-        elif name == "total fat (g)":  # Exact match for total fat
-            result["fat"] = value
-        elif name == "dietary fiber (g)":
-            result["fiber"] = value
-        elif name == "sugar (g)":
-            result["sugar"] = value
-        elif name == "saturated fat (g)":
-            result["saturated_fat"] = value
-        elif name == "trans fat (g)":
-            result["trans_fat"] = value
-        elif name == "cholesterol (mg)":
-            result["cholesterol"] = value
-        elif name == "sodium (mg)":
-            result["sodium"] = value
-        elif name == "potassium (mg)":
-            result["potassium"] = value
-        elif name == "calcium (mg)":
-            result["calcium"] = value
-        elif name == "iron (mg)":
-            result["iron"] = value
-        elif "vitamin d" in name:
-            result["vitamin_d"] = value
-        elif "vitamin c" in name:
-            result["vitamin_c"] = value
-        elif "vitamin a" in name:
-            result["vitamin_a"] = value
+        result[key] = int(value) if key == "calories" else value
 
     return result
 
 
-def scrape_location_menu(location: dict, date: str) -> list:
-    """Scrape all menu items for a location on a given date"""
+def parse_period_menu(location: dict, date: str, period_name: str, menu_resp: dict) -> list:
+    """Extract menu items from one period's menu response"""
     items = []
 
+    menu = menu_resp["menu"]
+    menu_periods = menu.get("periods", {})
+
+    # Handle different response formats
+    if isinstance(menu_periods, dict):
+        categories = menu_periods.get("categories", [])
+    elif isinstance(menu_periods, list) and len(menu_periods) > 0:
+        categories = menu_periods[0].get("categories", [])
+    else:
+        return items
+
+    # Category and period names recur in every location's menu; interning keeps one
+    # copy of each across all the items held until they are saved
+    period_name = sys.intern(period_name)
+    for cat in categories:
+        category_name = sys.intern(cat.get("name", "Other"))
+
+        for item in cat.get("items", []):
+            nutrients = parse_nutrients(item.get("nutrients", []))
+
+            # Extract dietary tags and allergens
+            filters = item.get("filters", [])
+            dietary_tags = []
+            allergens = []
+
+            for f in filters:
+                fname = f.get("name", "")
+                # Common dietary tags (hashed lookup in the known-tag table)
+                if fname in DIETARY_BITS:
+                    dietary_tags.append(fname)
+                elif fname.startswith("Good Source"):
+                    dietary_tags.append(fname)
+                else:
+                    # Likely an allergen
+                    allergens.append(fname)
+
+            items.append({
+                "location_id": location["id"],
+                "date": date,
+                "period": period_name,
+                "category": category_name,
+                "name": item.get("name", "Unknown"),
+                "description": item.get("desc", ""),
+                "calories": nutrients["calories"],
+                "protein": nutrients["protein"],
+                "carbs": nutrients["carbs"],
+                "fat": nutrients["fat"],
+                "fiber": nutrients["fiber"],
+                "sugar": nutrients["sugar"],
+                "saturated_fat": nutrients["saturated_fat"],
+                "trans_fat": nutrients["trans_fat"],
+                "cholesterol": nutrients["cholesterol"],
+                "sodium": nutrients["sodium"],
+                "potassium": nutrients["potassium"],
+                "calcium": nutrients["calcium"],
+                "iron": nutrients["iron"],
+                "vitamin_d": nutrients["vitamin_d"],
+                "vitamin_c": nutrients["vitamin_c"],
+                "vitamin_a": nutrients["vitamin_a"],
+                "dietary_tags": ",".join(dietary_tags),
+                "dietary_mask": dietary_mask(dietary_tags),
+                "allergens": ",".join(allergens)
+            })
+
+    return items
+
+
+async def scrape_location_menu(location: dict, date: str, semaphore: asyncio.Semaphore) -> list:
+    """Scrape all menu items for a location on a given date"""
     # Get periods
-    periods_resp = fetch(f"location/{location['id']}/periods?platform=0&date={date}")
-    time.sleep(REQUEST_DELAY)
+    periods_resp = await fetch_async(f"location/{location['id']}/periods?platform=0&date={date}", semaphore)
 
     if not periods_resp or periods_resp.get("status") != "success":
-        return items
+        return []
 
     if periods_resp.get("closed", False):
         print(f"    {location['name']}: CLOSED")
-        return items
+        return []
 
     periods = periods_resp.get("periods", [])
 
-    for period in periods:
-        period_name = period["name"]
-
-        # Get detailed menu
-        menu_resp = fetch(f"location/{location['id']}/periods/{period['id']}?platform=0&date={date}")
-        time.sleep(REQUEST_DELAY)
+    # Get every period's detailed menu concurrently; a menu unchanged since the
+    # last scrape is already in the database, so it is neither parsed nor saved again
+    menu_resps = await asyncio.gather(*(
+        fetch_async(f"location/{location['id']}/periods/{period['id']}?platform=0&date={date}", semaphore, True)
+        for period in periods
+    ))
 
+    items = []
+    for period, menu_resp in zip(periods, menu_resps):
+        if menu_resp is NOT_MODIFIED:
+            print(f"    {location['name']}: {period['name']} unchanged")
+            continue
         if not menu_resp or "menu" not in menu_resp:
             continue
+        items.extend(parse_period_menu(location, date, period["name"], menu_resp))
 
-        menu = menu_resp["menu"]
-        menu_periods = menu.get("periods", {})
-
-        # Handle different response formats
-        if isinstance(menu_periods, dict):
-            categories = menu_periods.get("categories", [])
-        elif isinstance(menu_periods, list) and len(menu_periods) > 0:
-            categories = menu_periods[0].get("categories", [])
-        else:
-            continue
+    return items
 
-        for cat in categories:
-            category_name = cat.get("name", "Other")
-
-            for item in cat.get("items", []):
-                nutrients = parse_nutrients(item.get("nutrients", []))
-
-                # Extract dietary tags and allergens
-                filters = item.get("filters", [])
-                dietary_tags = []
-                allergens = []
-
-                for f in filters:
-                    fname = f.get("name", "")
-                    # Common dietary tags
-                    if fname in ["Vegan", "Vegetarian", "Avoiding Gluten", "Halal", "Kosher"]:
-                        dietary_tags.append(fname)
-                    elif fname.startswith("Good Source"):
-                        dietary_tags.append(fname)
-                    else:
-                        # Likely an allergen
-                        allergens.append(fname)
-
-                items.append({
-                    "location_id": location["id"],
-                    "date": date,
-                    "period": period_name,
-                    "category": category_name,
-                    "name": item.get("name", "Unknown"),
-                    "description": item.get("desc", ""),
-                    "calories": nutrients["calories"],
-                    "protein": nutrients["protein"],
-                    "carbs": nutrients["carbs"],
-                    "fat": nutrients["fat"],
-                    "fiber": nutrients["fiber"],
-                    "sugar": nutrients["sugar"],
-                    "saturated_fat": nutrients["saturated_fat"],
-                    "trans_fat": nutrients["trans_fat"],
-                    "cholesterol": nutrients["cholesterol"],
-                    "sodium": nutrients["sodium"],
-                    "potassium": nutrients["potassium"],
-                    "calcium": nutrients["calcium"],
-                    "iron": nutrients["iron"],
-                    "vitamin_d": nutrients["vitamin_d"],
-                    "vitamin_c": nutrients["vitamin_c"],
-                    "vitamin_a": nutrients["vitamin_a"],
-                    "dietary_tags": ",".join(dietary_tags),
-                    "allergens": ",".join(allergens)
-                })
 
-    return items
+# Column order shared by the INSERT below and the parameter tuples built from item dicts
+MENU_ITEM_COLUMNS = (
+    "location_id", "date", "period", "category", "name", "description",
+    "calories", "protein", "carbs", "fat", "fiber", "sugar", "saturated_fat",
+    "trans_fat", "cholesterol", "sodium", "potassium", "calcium", "iron",
+    "vitamin_d", "vitamin_c", "vitamin_a", "dietary_tags", "dietary_mask", "allergens",
+)
+INSERT_MENU_ITEM_SQL = f"""
+    INSERT OR REPLACE INTO menu_items ({", ".join(MENU_ITEM_COLUMNS)})
+    VALUES ({", ".join("?" * len(MENU_ITEM_COLUMNS))})
+"""
+_menu_item_values = itemgetter(*MENU_ITEM_COLUMNS)
 
 
-def save_menu_items(items: list):
-    """Save menu items to database"""
+def save_menu_items(conn: sqlite3.Connection, items: list):
+    """Save menu items to database (conn must come from db.connect so the search index stays in sync)"""
     if not items:
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    rows = [_menu_item_values(item) for item in items]
 
-    for item in items:
-        try:
-            c.execute('''
-                INSERT OR REPLACE INTO menu_items
-                (location_id, date, period, category, name, description,
-                 calories, protein, carbs, fat, fiber, sugar, saturated_fat,
-                 trans_fat, cholesterol, sodium, potassium, calcium, iron,
-                 vitamin_d, vitamin_c, vitamin_a, dietary_tags, allergens)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                item["location_id"], item["date"], item["period"],
-                item["category"], item["name"], item["description"],
-                item["calories"], item["protein"], item["carbs"], item["fat"],
-                item["fiber"], item["sugar"], item["saturated_fat"],
-                item["trans_fat"], item["cholesterol"], item["sodium"],
-                item["potassium"], item["calcium"], item["iron"],
-                item["vitamin_d"], item["vitamin_c"], item["vitamin_a"],
-                item["dietary_tags"], item["allergens"]
-            ))
-        except sqlite3.Error as e:
-            print(f"    Error saving item: {e}")
+    # One executemany in one transaction per location
+    try:
+        with conn:
+            conn.executemany(INSERT_MENU_ITEM_SQL, rows)
+        return
+    except sqlite3.Error as e:
+        print(f"    Batch insert failed ({e}), saving items one by one")
+
+    # Row by row so one bad item doesn't lose the rest of the batch
+    with conn:
+        for row in rows:
+            try:
+                conn.execute(INSERT_MENU_ITEM_SQL, row)
+            except sqlite3.Error as e:
+                print(f"    Error saving item: {e}")
+
+
+def load_http_cache(conn: sqlite3.Connection):
+    """Load the stored response validators into http_cache"""
+    for endpoint, etag, last_modified, body_hash in conn.execute(
+        "SELECT endpoint, etag, last_modified, body_hash FROM http_cache"
+    ):
+        http_cache[endpoint] = (etag, last_modified, body_hash)
+
+
+def save_http_cache(conn: sqlite3.Connection):
+    """Store http_cache's validators (call only once the responses' items are saved)"""
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO http_cache (endpoint, etag, last_modified, body_hash) VALUES (?, ?, ?, ?)",
+            [(endpoint, *validators) for endpoint, validators in http_cache.items()]
+        )
 
-    conn.commit()
-    conn.close()
+
+async def scrape_locations(locations: list, date: str) -> list[list]:
+    """Scrape every location's menu; returns one item list per location, in order"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return await asyncio.gather(*(scrape_location_menu(loc, date, semaphore) for loc in locations))
 
 
 def scrape_all(date: str = None):
@@ -375,19 +500,29 @@ def scrape_all(date: str = None):
 
     # Get site and locations
     site_id, locations = get_site_info()
-    save_locations(locations)
 
-    # Scrape each location
+    # One writer connection for the whole run
+    conn = connect(DB_PATH)
+    save_locations(conn, locations)
+    load_http_cache(conn)
+
+    # Scrape all locations concurrently, bounded by the request semaphore
+    print(f"\nScraping {len(locations)} locations...")
+    all_items = aio.run(scrape_locations(locations, date))
+
     total_items = 0
-    for i, loc in enumerate(locations, 1):
+    for i, (loc, items) in enumerate(zip(locations, all_items), 1):
         print(f"\n[{i}/{len(locations)}] {loc['name']}...")
 
-        items = scrape_location_menu(loc, date)
-        save_menu_items(items)
+        save_menu_items(conn, items)
 
         print(f"    Saved {len(items)} items")
         total_items += len(items)
 
+    save_http_cache(conn)
+    analyze(conn)
+    conn.close()
+
     print("\n" + "=" * 60)
     print(f"COMPLETE: {total_items} total items saved to {DB_PATH}")
     print("=" * 60)
@@ -416,8 +551,6 @@ def get_stats():
 
 
 if __name__ == "__main__":
-    import sys
-
     if len(sys.argv) > 1 and sys.argv[1] == "stats":
         get_stats()
     else:
@@ -4,9 +4,21 @@ Fetches menu and nutritional data from dineoncampus API
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import asyncio
+import aio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import json
+from functools import lru_cache
+import orjson
 import os
+import threading
+from pathlib import Path
+try:
+    from requests_cache import CachedSession
+except ImportError:  # optional - every run goes to the network
+    CachedSession = None
 
 # DineOnCampus API base
 API_BASE = "https://api.dineoncampus.com/v1"
@@ -15,29 +27,111 @@ API_BASE = "https://api.dineoncampus.com/v1"
 # From URL pattern: dineoncampus.com/NYUeats -> site name is "NYUeats"
 SITE_NAME = "NYUeats"
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+    "Accept": "application/json",
+}
+TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+MAX_CONCURRENT_REQUESTS = 10  # menu requests in flight at once
+
+# Blocking menu requests run here; the pool size is what bounds concurrency
+_REQUEST_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+
+# Response cache lifetimes (seconds) by URL pattern, first match wins: site and
+# location metadata rarely change, and a date's menu is fixed once published
+CACHE_EXPIRY = {
+    "*/sites/*": 86400,
+    "*/site/*": 86400,
+    "*/locations/all_locations*": 86400,
+    "*/location/*": 604800,
+}
+
+# Shared HTTP session; with requests-cache installed, repeat runs are served from a
+# local SQLite cache and expired entries are revalidated with ETag/Last-Modified
+if CachedSession is not None:
+    SESSION = CachedSession(
+        str(Path(__file__).parent / "menumap_cache"),
+        backend="sqlite",
+        expire_after=3600,
+        urls_expire_after=CACHE_EXPIRY,
+        cache_control=True,
+        stale_if_error=True,
+    )
+else:
+    SESSION = requests.Session()
+
+SESSION.headers.update(HEADERS)
+# Keep-alive pool sized for the concurrent menu fetches; rate limits and gateway errors
+# are retried with backoff, and the last response is returned for the callers to report
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504], raise_on_status=False),
+))
+
+# Candidate URL patterns for each lookup, in the order they are probed
+SITE_INFO_TEMPLATES = (
+    API_BASE + "/sites/{site_name}",
+    API_BASE + "/site/{site_name}",
+    "https://api.dineoncampus.com/v1/sites/find?name={site_name}",
+)
+MENU_TEMPLATES = (
+    API_BASE + "/location/{location_id}/periods?platform=0&date={date}",
+    API_BASE + "/location/menu?site_id={site_id}&location_id={location_id}&date={date}",
+    "https://new.dineoncampus.com/v1/location/menu.json?site_id={site_id}&location_id={location_id}&date={date}",
+)
+
+# The pattern that last worked for each lookup, kept across runs so later calls
+# try it first instead of paying for the failing probes again
+ENDPOINTS_FILE = Path(__file__).parent / ".menumap_endpoints.json"
+_endpoints_lock = threading.Lock()
+
+
+def _load_working_templates() -> dict:
+    try:
+        return orjson.loads(ENDPOINTS_FILE.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+
+
+_working_templates = _load_working_templates()
+
+
+def _candidate_templates(kind: str, templates: tuple) -> tuple:
+    """templates with the one that last worked for this lookup moved to the front"""
+    working = _working_templates.get(kind)
+    if working in templates and working != templates[0]:
+        return (working,) + tuple(t for t in templates if t != working)
+    return templates
+
+
+def _remember_template(kind: str, template: str):
+    """Record the pattern that worked for this lookup (persisted when it changes)"""
+    with _endpoints_lock:
+        if _working_templates.get(kind) == template:
+            return
+        _working_templates[kind] = template
+        try:
+            ENDPOINTS_FILE.write_bytes(orjson.dumps(_working_templates))
+        except OSError as e:
+            print(f"Could not save working endpoints: {e}")
+
 
 def get_site_info(site_name: str) -> dict:
     """
     Get site information including site_id and available locations.
     """
-    # Try different API patterns
-    endpoints = [
-        f"{API_BASE}/sites/{site_name}",
-        f"{API_BASE}/site/{site_name}",
-        f"https://api.dineoncampus.com/v1/sites/find?name={site_name}",
-    ]
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-        "Accept": "application/json",
-    }
-
-    for endpoint in endpoints:
+    # Try different API patterns, starting with the one that worked last
+    for template in _candidate_templates("site_info", SITE_INFO_TEMPLATES):
+        endpoint = template.format(site_name=site_name)
         try:
-            response = requests.get(endpoint, headers=headers, timeout=10)
+            response = SESSION.get(endpoint, timeout=TIMEOUT)
             print(f"[{response.status_code}] {endpoint}")
             if response.status_code == 200:
-                return response.json()
+                data = orjson.loads(response.content)
+                _remember_template("site_info", template)
+                return data
         except Exception as e:
             print(f"Error: {endpoint} - {e}")
 
@@ -50,16 +144,11 @@ def get_locations(site_id: str) -> list:
     """
     endpoint = f"{API_BASE}/locations/all_locations?site_id={site_id}"
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-        "Accept": "application/json",
-    }
-
     try:
-        response = requests.get(endpoint, headers=headers, timeout=10)
+        response = SESSION.get(endpoint, timeout=TIMEOUT)
         print(f"[{response.status_code}] Locations endpoint")
         if response.status_code == 200:
-            return response.json()
+            return orjson.loads(response.content)
     except Exception as e:
         print(f"Error getting locations: {e}")
 
@@ -78,25 +167,16 @@ def get_menu(site_id: str, location_id: str, date: str = None) -> dict:
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
 
-    # Try different endpoint patterns
-    endpoints = [
-        f"{API_BASE}/location/{location_id}/periods?platform=0&date={date}",
-        f"{API_BASE}/location/menu?site_id={site_id}&location_id={location_id}&date={date}",
-        f"https://new.dineoncampus.com/v1/location/menu.json?site_id={site_id}&location_id={location_id}&date={date}",
-    ]
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
-        "Accept": "application/json",
-    }
-
-    for endpoint in endpoints:
+    # Try different endpoint patterns, starting with the one that worked last
+    for template in _candidate_templates("menu", MENU_TEMPLATES):
+        endpoint = template.format(site_id=site_id, location_id=location_id, date=date)
         try:
-            response = requests.get(endpoint, headers=headers, timeout=10)
+            response = SESSION.get(endpoint, timeout=TIMEOUT)
             print(f"[{response.status_code}] {endpoint[:80]}...")
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if data:
+                    _remember_template("menu", template)
                     return data
         except Exception as e:
             print(f"Error: {e}")
@@ -104,6 +184,24 @@ def get_menu(site_id: str, location_id: str, date: str = None) -> dict:
     return None
 
 
+async def find_site_info(site_slugs: list) -> dict:
+    """
+    Probe every site slug concurrently and return the first site info found.
+    """
+    loop = asyncio.get_running_loop()
+    probes = [loop.run_in_executor(_REQUEST_EXECUTOR, get_site_info, slug) for slug in site_slugs]
+
+    for probe in asyncio.as_completed(probes):
+        info = await probe
+        if info:
+            # Drop the probes that haven't started yet
+            for other in probes:
+                other.cancel()
+            return info
+
+    return None
+
+
 def discover_nyu_ids():
     """
     Attempt to discover NYU's site_id and location_ids by trying various API calls.
@@ -115,47 +213,116 @@ def discover_nyu_ids():
     # Known site slugs from URL
     site_slugs = ["NYUeats", "nyu", "nyueats"]
 
-    for slug in site_slugs:
-        print(f"\nTrying site slug: {slug}")
-        info = get_site_info(slug)
-        if info:
-            print(f"Found site info: {json.dumps(info, indent=2)[:500]}")
-            return info
+    print(f"\nTrying site slugs: {', '.join(site_slugs)}")
+    info = aio.run(find_site_info(site_slugs))
+    if info:
+        print(f"Found site info: {orjson.dumps(info, option=orjson.OPT_INDENT_2).decode()[:500]}")
+        return info
 
     # If direct lookup fails, try to scrape from the webpage
     print("\nDirect API lookup failed. Will need to extract IDs from webpage...")
     return None
 
 
-def scrape_all_menus(site_id: str, locations: list, date: str = None) -> list:
+async def get_menus(site_id: str, pairs: list[tuple[str, str]]) -> list:
     """
-    Scrape menus from all locations for a given date.
+    get_menu() for every (location_id, date) pair concurrently on the request pool.
+
+    Returns:
+        The menus in the order of pairs (None where a fetch found nothing)
     """
-    all_menus = []
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(_REQUEST_EXECUTOR, get_menu, site_id, loc_id, date)
+        for loc_id, date in pairs
+    ))
+
 
-    for location in locations:
-        loc_id = location.get("id") or location.get("_id")
-        loc_name = location.get("name", "Unknown")
+async def scrape_all_menus_async(site_id: str, locations: list, date: str = None) -> list:
+    """
+    Scrape menus from all locations for a given date, fetching locations concurrently.
+    """
+    if date is None:
+        date = datetime.now().strftime("%Y-%m-%d")
 
-        print(f"\nFetching menu for: {loc_name}")
-        menu = get_menu(site_id, loc_id, date)
+    loc_ids = [location.get("id") or location.get("_id") for location in locations]
+    print(f"\nFetching menus for {len(locations)} locations...")
+    menus = await get_menus(site_id, [(loc_id, date) for loc_id in loc_ids])
 
+    all_menus = []
+    for location, loc_id, menu in zip(locations, loc_ids, menus):
         if menu:
             all_menus.append({
                 "location_id": loc_id,
-                "location_name": loc_name,
-                "date": date or datetime.now().strftime("%Y-%m-%d"),
+                "location_name": location.get("name", "Unknown"),
+                "date": date,
                 "menu_data": menu
             })
 
     return all_menus
 
 
+def scrape_all_menus(site_id: str, locations: list, date: str = None) -> list:
+    """
+    Scrape menus from all locations for a given date.
+    """
+    return aio.run(scrape_all_menus_async(site_id, locations, date))
+
+
+async def scrape_week_async(site_id: str, locations: list, start_date: str = None, days: int = 7) -> dict:
+    """
+    Scrape and parse menus for every location over consecutive dates, all fetched concurrently.
+
+    Args:
+        site_id: The site identifier
+        locations: Locations to scrape
+        start_date: First date in YYYY-MM-DD format (defaults to today)
+        days: Number of dates to scrape
+
+    Returns:
+        {(location_id, date): parsed menu items} for every pair that returned a menu
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime.now()
+    dates = [(start + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days)]
+
+    pairs = [(location.get("id") or location.get("_id"), date) for location in locations for date in dates]
+    print(f"\nFetching {len(pairs)} menus ({len(locations)} locations x {days} days)...")
+    menus = await get_menus(site_id, pairs)
+
+    return {pair: parse_menu_items(menu) for pair, menu in zip(pairs, menus) if menu}
+
+
+def scrape_week(site_id: str, locations: list, start_date: str = None, days: int = 7) -> dict:
+    """
+    Scrape and parse a week of menus for all locations.
+    """
+    return aio.run(scrape_week_async(site_id, locations, start_date, days))
+
+
+# Substring rules for nutrient names, first match wins: (required, excluded, field)
+NUTRIENT_RULES = (
+    (("calorie",), (), "calories"),
+    (("protein",), (), "protein"),
+    (("carb",), (), "carbs"),
+    (("fat",), ("saturated", "trans"), "fat"),
+)
+
+
+@lru_cache(maxsize=None)
+def nutrient_field(name: str) -> str | None:
+    """Parsed item field for a lowercased nutrient name (None if we don't track it)"""
+    for required, excluded, field in NUTRIENT_RULES:
+        if all(sub in name for sub in required) and not any(sub in name for sub in excluded):
+            return field
+    return None
+
+
 def parse_menu_items(raw_menu: dict) -> list:
     """
     Parse raw API response into structured menu items with nutrition info.
     """
     items = []
+    add_item = items.append
 
     # The structure varies, but typically:
     # menu -> periods[] -> categories[] -> items[]
@@ -188,17 +355,10 @@ def parse_menu_items(raw_menu: dict) -> list:
                 # Extract nutrition
                 nutrients = item.get("nutrients", [])
                 for nutrient in nutrients:
-                    name = nutrient.get("name", "").lower()
-                    value = nutrient.get("value", 0)
-
-                    if "calorie" in name:
-                        parsed["calories"] = value
-                    elif "protein" in name:
-                        parsed["protein"] = value
-                    elif "carb" in name:
-                        parsed["carbs"] = value
-                    elif "fat" in name and "saturated" not in name and "trans" not in name:
-                        parsed["fat"] = value
+                    # Names repeat across every item, so each is classified only once
+                    field = nutrient_field(nutrient.get("name", "").lower())
+                    if field is not None:
+                        parsed[field] = nutrient.get("value", 0)
 
                 # Extract dietary tags
                 filters = item.get("filters", [])
@@ -214,7 +374,7 @@ def parse_menu_items(raw_menu: dict) -> list:
                 if item.get("gluten_free"):
                     parsed["dietary_tags"].append("Gluten-Free")
 
-                items.append(parsed)
+                add_item(parsed)
 
     return items
 
@@ -227,7 +387,7 @@ if __name__ == "__main__":
         print("\n" + "=" * 60)
         print("SUCCESS - Found NYU dining data!")
         print("=" * 60)
-        print(json.dumps(result, indent=2))
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
     else:
         print("\n" + "=" * 60)
         print("Need to extract IDs manually from webpage")
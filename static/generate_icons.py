@@ -91,10 +91,14 @@ def main():
         'icon-512.png': 512,  # Splash/Store
     }
 
+    # Draw once at full size; smaller icons are downsampled from it (also smoother edges)
+    master_size = max(sizes.values())
+    master = create_icon(master_size)
+
     for filename, size in sizes.items():
         print(f"Generating {filename} ({size}x{size})...")
-        icon = create_icon(size)
-        icon.save(filename, 'PNG')
+        icon = master if size == master_size else master.resize((size, size), Image.LANCZOS)
+        icon.save(filename, 'PNG', optimize=True)
         print(f"  Saved {filename}")
 
     print("\nDone! Icons generated successfully.")
@@ -3,6 +3,8 @@ Test script for MenuMap AI Coach
 Run with: OPENAI_API_KEY=your_key python3 test_ai.py
 """
 from ai_coach import get_recommendation
+import aio
+import asyncio
 import time
 
 TEST_QUERIES = [
@@ -25,29 +27,44 @@ TEST_QUERIES = [
     "something under 400 calories but filling",
 ]
 
+MAX_CONCURRENT_QUERIES = 3  # Rate limiting - queries in flight at once
+
+async def _timed(query: str, semaphore: asyncio.Semaphore) -> tuple[str, float]:
+    """Run one query, returning its response and response time"""
+    async with semaphore:
+        start = time.perf_counter()
+        response = await get_recommendation(query)
+        return response, time.perf_counter() - start
+
+async def run_all() -> list:
+    """Run every test query concurrently; failures come back as exceptions"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+    return await asyncio.gather(*(_timed(q, semaphore) for q in TEST_QUERIES), return_exceptions=True)
+
 def run_tests():
     print("=" * 70)
     print("MenuMap AI Coach - Test Suite")
     print("=" * 70)
 
-    for i, query in enumerate(TEST_QUERIES, 1):
+    start = time.perf_counter()
+    results = aio.run(run_all())
+    total = time.perf_counter() - start
+
+    for i, (query, result) in enumerate(zip(TEST_QUERIES, results), 1):
         print(f"\n{'='*70}")
         print(f"TEST {i}: {query}")
         print("-" * 70)
 
-        try:
-            start = time.time()
-            response = get_recommendation(query)
-            elapsed = time.time() - start
-
+        if isinstance(result, Exception):
+            print(f"ERROR: {result}")
+        else:
+            response, elapsed = result
             print(response)
             print(f"\n[Response time: {elapsed:.1f}s]")
 
-        except Exception as e:
-            print(f"ERROR: {e}")
-
         print()
-        time.sleep(1)  # Rate limiting
+
+    print(f"[Total time: {total:.1f}s]")
 
 
 if __name__ == "__main__":
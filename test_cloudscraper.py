@@ -4,13 +4,20 @@ Based on DISH-API approach
 """
 import cloudscraper
 from fake_useragent import UserAgent
-import json
+from urllib3.util.retry import Retry
+import orjson
 import time
 
 # Initialize scraper
 scraper = cloudscraper.create_scraper()
 ua = UserAgent()
 
+# Retry rate limits and gateway errors with backoff. Set on cloudscraper's own
+# adapter - mounting a plain HTTPAdapter would drop its Cloudflare cipher suite.
+scraper.adapters["https://"].max_retries = Retry(
+    total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504], raise_on_status=False
+)
+
 API_BASE = "https://api.dineoncampus.com/v1/"
 
 def fetch(endpoint):
@@ -22,7 +29,7 @@ def fetch(endpoint):
     response = scraper.get(url, headers=headers, timeout=30)
 
     if response.status_code == 200:
-        return response.json()
+        return orjson.loads(response.content)
     else:
         print(f"Error {response.status_code}: {response.text[:200]}")
         return None
@@ -48,15 +55,18 @@ if site_info and site_info.get("status") == "success":
 
     if locations and locations.get("status") == "success":
         all_locations = []
+        seen_ids = set()
 
         # Locations from buildings
         for building in locations.get("buildings", []):
             for loc in building.get("locations", []):
                 all_locations.append(loc)
+                seen_ids.add(loc["id"])
 
         # Standalone locations
         for loc in locations.get("locations", []):
-            if loc["id"] not in [l["id"] for l in all_locations]:
+            if loc["id"] not in seen_ids:
+                seen_ids.add(loc["id"])
                 all_locations.append(loc)
 
         print(f"Found {len(all_locations)} locations:")
@@ -0,0 +1,59 @@
+"""
+Test script for the CampusBite intent router
+Run with: python3 test_router.py (or pytest test_router.py)
+"""
+from intent_router import classify
+
+LIPTON = "NYU EATS at Lipton"
+
+# (query, expected classification)
+TEST_CASES = [
+    # Yes/no questions about right now -> open/closed status
+    ("is lipton open", ("open_now", LIPTON)),
+    ("Is Lipton open?", ("open_now", LIPTON)),
+    ("is lipton closed", ("open_now", LIPTON)),
+    ("is lipton still open", ("open_now", LIPTON)),
+    ("lipton open now", ("open_now", LIPTON)),
+    ("is lipton currently open", ("open_now", LIPTON)),
+    ("what's open now at lipton", ("open_now", LIPTON)),
+
+    # Schedule questions -> today's hours
+    ("what time does lipton open", ("hours", LIPTON)),
+    ("when does lipton open", ("hours", LIPTON)),
+    ("when is lipton open", ("hours", LIPTON)),
+    ("what time does lipton close", ("hours", LIPTON)),
+    ("when does lipton close tonight", ("hours", LIPTON)),
+    ("lipton hours", ("hours", LIPTON)),
+    ("what are the hours for third north", ("hours", "NYU EATS at Third North")),
+
+    # Location list and everything else
+    ("list all dining halls", ("locations", None)),
+    ("high protein lunch at lipton", ("chat", None)),
+    ("is lipton or kimmel open", ("chat", None)),
+]
+
+
+def test_classify():
+    for query, expected in TEST_CASES:
+        assert classify(query) == expected, f"{query!r}: {classify(query)} != {expected}"
+
+
+def run_tests():
+    print("=" * 70)
+    print("CampusBite Intent Router - Test Suite")
+    print("=" * 70)
+
+    failures = 0
+    for query, expected in TEST_CASES:
+        got = classify(query)
+        ok = got == expected
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {query!r:45} -> {got[0]}" + ("" if ok else f" (expected {expected[0]})"))
+
+    print("-" * 70)
+    print(f"{len(TEST_CASES) - failures}/{len(TEST_CASES)} passed")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if run_tests() else 1)
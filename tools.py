@@ -2,10 +2,15 @@
 MenuMap - Database Query Tools
 Functions that the AI can call to search the menu database
 """
+import re
 import sqlite3
+import threading
 from pathlib import Path
 from typing import Optional
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from cachetools.func import ttl_cache
+from db import DIETARY_BITS, connect, ensure_schema
 
 # EST timezone (UTC-5)
 EST = timezone(timedelta(hours=-5))
@@ -172,17 +177,59 @@ DINING_HOURS = {
 }
 
 
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# weekday() (0=Monday, 6=Sunday) -> DINING_HOURS day type
+DAY_TYPES = ("weekday", "weekday", "weekday", "weekday", "friday", "saturday", "sunday")
+
+
 def _get_day_type() -> str:
     """Get the current day type for hours lookup"""
-    day = _now_est().weekday()  # 0=Monday, 6=Sunday
-    if day < 4:  # Mon-Thu
-        return "weekday"
-    elif day == 4:  # Friday
-        return "friday"
-    elif day == 5:  # Saturday
-        return "saturday"
-    else:  # Sunday
-        return "sunday"
+    return DAY_TYPES[_now_est().weekday()]
+
+
+def _now_context() -> tuple[datetime, str, str, str]:
+    """The current EST time as (now, day name, "HH:MM AM/PM" time, day type), read and formatted once"""
+    now = _now_est()
+    weekday = now.weekday()
+    return now, DAY_NAMES[weekday], now.strftime("%I:%M %p"), DAY_TYPES[weekday]
+
+
+@lru_cache(maxsize=None)
+def _hours_for_day_type(day_type: str) -> dict:
+    """
+    Every location's status and hours for a day type.
+
+    Hours only depend on the day type, so this is built once per type; the returned
+    dict is shared between calls and must not be modified.
+    """
+    today_hours = {}
+    for loc_name, all_hours in DINING_HOURS.items():
+        hours = all_hours.get(day_type)
+        if hours:
+            today_hours[loc_name] = {"status": "Open", "hours": hours}
+        else:
+            today_hours[loc_name] = {"status": "Closed"}
+    return today_hours
+
+
+def _parse_ampm(time_str: str) -> int:
+    """Minutes since midnight for an "H:MM AM/PM" time"""
+    clock, meridiem = time_str.split()
+    hour, minute = map(int, clock.split(":"))
+    return (hour % 12 + (12 if meridiem == "PM" else 0)) * 60 + minute
+
+
+# DINING_HOURS as (start, end) minutes since midnight, parsed once at import
+# Format: {location_name: {day_type: {period: (start_minutes, end_minutes)} or None}}
+DINING_HOURS_MINUTES = {
+    loc_name: {
+        day_type: {period: (_parse_ampm(start), _parse_ampm(end)) for period, (start, end) in hours.items()}
+        if hours else None
+        for day_type, hours in all_hours.items()
+    }
+    for loc_name, all_hours in DINING_HOURS.items()
+}
 
 
 def get_current_time() -> dict:
@@ -193,20 +240,19 @@ def get_current_time() -> dict:
     Returns:
         Dict with current time info
     """
-    now = _now_est()
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    now, day_name, current_time, day_type = _now_context()
 
     return {
-        "current_time": now.strftime("%I:%M %p"),
-        "day_of_week": day_names[now.weekday()],
+        "current_time": current_time,
+        "day_of_week": day_name,
         "date": now.strftime("%B %d, %Y"),
         "is_weekend": now.weekday() >= 5,
-        "day_type": _get_day_type(),
+        "day_type": day_type,
         "hint": "Use this to recommend currently open locations and appropriate meal periods."
     }
 
 # Categories that are "build your own" stations - items are components, not complete meals
-COMPONENT_CATEGORIES = {
+COMPONENT_CATEGORIES = frozenset({
     # Salad bars
     "fresh 52 salad bar", "salad bar", "salad bar toppings", "salad bar dressings",
     "salad bar protein", "salad bar greens", "salad bar fruit and yogurt",
@@ -224,10 +270,10 @@ COMPONENT_CATEGORIES = {
     "culture corner starch", "culture corner side",
     # Misc components
     "root and seeds", "plant based", "plant'd",
-}
+})
 
 # Categories that are complete entrees/meals
-ENTREE_CATEGORIES = {
+ENTREE_CATEGORIES = frozenset({
     "true burger", "burger 212", "burger 212 grill", "crave nyu",
     "cluckstein", "500 degrees pizza", "al forno pizza", "personal pizza",
     "pizza station", "pizza/alforno", "quesadilla/burrito/slider",
@@ -239,40 +285,106 @@ ENTREE_CATEGORIES = {
     "the soup bowl", "soup bowl", "soup", "spoonfuls",
     # Palladium specific
     "culture corner entree", "paper lantern protein",
-}
+})
+
+# Lowercased category -> item type; components win for categories listed in both sets
+_CATEGORY_TYPES = {cat: "entree" for cat in ENTREE_CATEGORIES} | {cat: "component" for cat in COMPONENT_CATEGORIES}
 
+# Category name fragments that mark an unlisted category as a build-your-own component
+_COMPONENT_HINTS = ("choose your", "bar", "toppings", "sides", "sauce")
 
+
+@lru_cache(maxsize=1024)
 def _classify_item_type(category: str) -> str:
-    """Classify an item as 'component', 'entree', or 'other' based on category"""
+    """
+    Classify an item as 'component', 'entree', or 'other' based on category.
+
+    Memoized per category: a day's menu has a couple of hundred distinct categories,
+    so each is lowercased and matched once rather than for every result row.
+    """
     cat_lower = category.lower() if category else ""
 
-    if cat_lower in COMPONENT_CATEGORIES:
+    item_type = _CATEGORY_TYPES.get(cat_lower)
+    if item_type is not None:
+        return item_type
+
+    # Heuristic: if it has "choose your" or "bar" or "toppings", it's a component
+    if any(x in cat_lower for x in _COMPONENT_HINTS):
         return "component"
-    elif cat_lower in ENTREE_CATEGORIES:
-        return "entree"
-    else:
-        # Heuristic: if it has "choose your" or "bar" or "toppings", it's a component
-        if any(x in cat_lower for x in ["choose your", "bar", "toppings", "sides", "sauce"]):
-            return "component"
-        return "other"
+    return "other"
+
+
+def _sql_strings(values) -> str:
+    """Comma-separated SQL string literals for a fixed set of names"""
+    return ", ".join("'" + value.replace("'", "''") + "'" for value in sorted(values))
+
+
+# search_menu's item_type filter: the same rules as _classify_item_type, as SQL
+_ITEM_TYPE_SQL = {
+    "entree": f"lower(mi.category) IN ({_sql_strings(ENTREE_CATEGORIES - COMPONENT_CATEGORIES)})",
+    "component": (
+        f"(lower(mi.category) IN ({_sql_strings(COMPONENT_CATEGORIES)})"
+        f" OR (lower(mi.category) NOT IN ({_sql_strings(ENTREE_CATEGORIES)})"
+        f" AND ({' OR '.join(f'instr(lower(mi.category), {_sql_strings([hint])})' for hint in _COMPONENT_HINTS)})))"
+    ),
+}
+
+
+# One connection per thread, opened on first use and kept for the thread's lifetime.
+# Tool calls run in parallel on worker threads, so they don't share a single handle.
+_local = threading.local()
+
+# search_menu's SQL only varies with which filters are present (every value, including
+# the limit, is a bound parameter), so each shape is compiled once per connection and
+# reused from sqlite3's statement cache. Room for every combination seen in practice.
+STATEMENT_CACHE_SIZE = 512
 
 
-def _get_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+def _get_connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        ensure_schema(conn)  # read-only once the database is migrated
     return conn
 
 
+# Lowercased dietary tag -> its bit in menu_items.dietary_mask
+_TAG_BITS = {tag.lower(): bit for tag, bit in DIETARY_BITS.items()}
+
+# Meal periods some locations name differently (Dinner is "Supper" at some halls).
+# Periods, location names, item names and tags are matched case-insensitively with
+# NOCASE / LIKE rather than by lowering both sides of every row.
+PERIOD_ALIASES = {"dinner": ("Dinner", "Supper")}
+
+# The latest menu date only moves when the scraper loads a new day
+CURRENT_DATE_TTL = 300  # seconds
+
+
+@ttl_cache(maxsize=1, ttl=CURRENT_DATE_TTL)
 def _get_current_date() -> str:
-    """Get the most recent date in the database"""
+    """Get the most recent date in the database (cached for CURRENT_DATE_TTL seconds)"""
     conn = _get_connection()
     c = conn.cursor()
     c.execute("SELECT MAX(date) FROM menu_items")
     date = c.fetchone()[0]
-    conn.close()
     return date
 
 
+# Locations change about once a semester; the scraper runs in its own process, so a
+# new location shows up here within LOCATIONS_TTL rather than on an explicit reload
+LOCATIONS_TTL = 3600  # seconds
+
+
+@ttl_cache(maxsize=1, ttl=LOCATIONS_TTL)
+def _get_location_names() -> tuple[str, ...]:
+    """Names of all locations in the database, sorted (cached for LOCATIONS_TTL seconds)"""
+    conn = _get_connection()
+    c = conn.cursor()
+    c.execute("SELECT name FROM locations ORDER BY name")
+    return tuple(row[0] for row in c.fetchall())
+
+
 def list_locations() -> list[str]:
     """
     Get all available dining locations.
@@ -280,12 +392,43 @@ def list_locations() -> list[str]:
     Returns:
         List of location names
     """
-    conn = _get_connection()
-    c = conn.cursor()
-    c.execute("SELECT name FROM locations ORDER BY name")
-    locations = [row[0] for row in c.fetchall()]
-    conn.close()
-    return locations
+    return list(_get_location_names())
+
+
+# (lowercased name, name) for every location with known hours, in DINING_HOURS order
+_HOURS_LOCATIONS_LOWER = tuple((loc_name.lower(), loc_name) for loc_name in DINING_HOURS)
+
+
+@lru_cache(maxsize=256)
+def _match_hours_location(location_lower: str) -> Optional[str]:
+    """First location in DINING_HOURS whose name contains location_lower (None if none does)"""
+    for loc_lower, loc_name in _HOURS_LOCATIONS_LOWER:
+        if location_lower in loc_lower:
+            return loc_name
+    return None
+
+
+def is_location_open_now(location: str) -> bool:
+    """
+    Whether a dining location is inside one of today's meal periods right now.
+
+    Args:
+        location: Dining hall name (partial match supported)
+
+    Returns:
+        True if open; False if closed or its hours are unknown
+    """
+    loc_name = _match_hours_location(location.lower())
+    if loc_name is None:
+        return False
+
+    now, _, _, day_type = _now_context()
+    today_hours = DINING_HOURS_MINUTES[loc_name].get(day_type)
+    if not today_hours:
+        return False
+
+    minute = now.hour * 60 + now.minute
+    return any(start <= minute < end for start, end in today_hours.values())
 
 
 def get_location_hours(location: str) -> dict:
@@ -299,39 +442,36 @@ def get_location_hours(location: str) -> dict:
     Returns:
         Dict with location name, today's hours, and current time context
     """
-    now = _now_est()
-    day_type = _get_day_type()
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    _, day_name, current_time, day_type = _now_context()
 
     # Find matching location
-    location_lower = location.lower()
-    for loc_name, all_hours in DINING_HOURS.items():
-        if location_lower in loc_name.lower():
-            today_hours = all_hours.get(day_type)
-
-            if today_hours is None:
-                return {
-                    "location": loc_name,
-                    "today": day_names[now.weekday()],
-                    "current_time": now.strftime("%I:%M %p"),
-                    "hours": None,
-                    "status": "CLOSED today",
-                    "note": f"{loc_name} is closed on {day_names[now.weekday()]}s."
-                }
+    loc_name = _match_hours_location(location.lower())
+    if loc_name is not None:
+        today_hours = DINING_HOURS[loc_name].get(day_type)
 
+        if today_hours is None:
             return {
                 "location": loc_name,
-                "today": day_names[now.weekday()],
-                "current_time": now.strftime("%I:%M %p"),
-                "hours": today_hours,
-                "status": "Open today",
-                "note": "Hours may vary on holidays. Check NYU Eats for updates."
+                "today": day_name,
+                "current_time": current_time,
+                "hours": None,
+                "status": "CLOSED today",
+                "note": f"{loc_name} is closed on {day_name}s."
             }
 
+        return {
+            "location": loc_name,
+            "today": day_name,
+            "current_time": current_time,
+            "hours": today_hours,
+            "status": "Open today",
+            "note": "Hours may vary on holidays. Check NYU Eats for updates."
+        }
+
     return {
         "location": location,
-        "today": day_names[now.weekday()],
-        "current_time": now.strftime("%I:%M %p"),
+        "today": day_name,
+        "current_time": current_time,
         "hours": None,
         "status": "Unknown",
         "note": "Hours not available for this location."
@@ -345,26 +485,40 @@ def get_all_hours() -> dict:
     Returns:
         Dict with all locations and their hours for today
     """
-    now = _now_est()
-    day_type = _get_day_type()
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-
-    today_hours = {}
-    for loc_name, all_hours in DINING_HOURS.items():
-        hours = all_hours.get(day_type)
-        if hours:
-            today_hours[loc_name] = {"status": "Open", "hours": hours}
-        else:
-            today_hours[loc_name] = {"status": "Closed"}
+    _, day_name, current_time, day_type = _now_context()
 
     return {
-        "today": day_names[now.weekday()],
-        "current_time": now.strftime("%I:%M %p"),
-        "locations": today_hours,
+        "today": day_name,
+        "current_time": current_time,
+        "locations": _hours_for_day_type(day_type),
         "note": "Hours may vary on holidays. Check NYU Eats for updates."
     }
 
 
+# search_menu result key -> selected SQL column, in result order. item_type is a
+# NULL placeholder filled in from the category, so it keeps its place in the dict.
+RESULT_COLUMNS = {
+    "name": "mi.name",
+    "location": "l.name AS location",
+    "period": "mi.period",
+    "category": "mi.category",
+    "item_type": "NULL AS item_type",
+    "calories": "mi.calories",
+    "protein": "mi.protein",
+    "carbs": "mi.carbs",
+    "fat": "mi.fat",
+    "fiber": "mi.fiber",
+    "sugar": "mi.sugar",
+    "sodium": "mi.sodium",
+    "saturated_fat": "mi.saturated_fat",
+    "cholesterol": "mi.cholesterol",
+    "dietary_tags": "mi.dietary_tags",
+}
+
+# Keys every result has: they identify an item for de-duplication
+_RESULT_KEY_FIELDS = ("name", "location", "period")
+
+
 def search_menu(
     keywords: Optional[list[str]] = None,
     period: Optional[str] = None,
@@ -376,6 +530,8 @@ def search_menu(
     max_sodium: Optional[float] = None,
     min_fiber: Optional[float] = None,
     max_sugar: Optional[float] = None,
+    item_type: Optional[str] = None,
+    fields: Optional[tuple[str, ...]] = None,
     limit: int = 20
 ) -> list[dict]:
     """
@@ -392,33 +548,33 @@ def search_menu(
         max_sodium: Maximum sodium in mg (for low-sodium diets)
         min_fiber: Minimum fiber in grams (for high-fiber needs)
         max_sugar: Maximum sugar in grams (for low-sugar diets)
+        item_type: Only "entree" or only "component" items (see _classify_item_type)
+        fields: Result keys to return (see RESULT_COLUMNS); name, location and period
+            are always included, and item_type brings category with it. Default: all
         limit: Maximum number of results (default 20)
 
     Returns:
-        List of matching menu items with full nutrition info
+        List of matching menu items with full nutrition info (or the requested fields)
     """
     conn = _get_connection()
     c = conn.cursor()
 
     date = _get_current_date()
 
+    # Selected columns (unknown field names are ignored)
+    if fields is None:
+        wanted = RESULT_COLUMNS
+    else:
+        wanted = set(_RESULT_KEY_FIELDS).union(fields)
+        if "item_type" in wanted:
+            wanted.add("category")
+    columns = ", ".join(column for key, column in RESULT_COLUMNS.items() if key in wanted)
+    classify = "item_type" in wanted
+    split_tags = "dietary_tags" in wanted
+
     # Build query dynamically
-    query = """
-        SELECT
-            mi.name,
-            l.name as location,
-            mi.period,
-            mi.category,
-            mi.calories,
-            mi.protein,
-            mi.carbs,
-            mi.fat,
-            mi.fiber,
-            mi.sugar,
-            mi.sodium,
-            mi.saturated_fat,
-            mi.cholesterol,
-            mi.dietary_tags
+    query = f"""
+        SELECT {columns}
         FROM menu_items mi
         JOIN locations l ON mi.location_id = l.id
         WHERE mi.date = ?
@@ -427,32 +583,37 @@ def search_menu(
 
     # Period filter (handle Dinner/Supper as equivalent)
     if period:
-        if period.lower() == "dinner":
-            query += " AND (LOWER(mi.period) = 'dinner' OR LOWER(mi.period) = 'supper')"
-        else:
-            query += " AND LOWER(mi.period) = LOWER(?)"
-            params.append(period)
+        periods = PERIOD_ALIASES.get(period.lower(), (period,))
+        query += f" AND mi.period COLLATE NOCASE IN ({', '.join('?' * len(periods))})"
+        params.extend(periods)
 
     # Location filter (partial match)
     if location:
-        query += " AND LOWER(l.name) LIKE LOWER(?)"
+        query += " AND l.name LIKE ?"
         params.append(f"%{location}%")
 
     # Keyword search in item name
     if keywords:
         keyword_conditions = []
         for kw in keywords:
-            keyword_conditions.append("LOWER(mi.name) LIKE LOWER(?)")
+            keyword_conditions.append("mi.name LIKE ?")
             params.append(f"%{kw}%")
         query += f" AND ({' OR '.join(keyword_conditions)})"
 
-    # Dietary tag filter
+    # Dietary tag filter: every tag must be present. Known tags are bits of
+    # dietary_mask; others are matched as whole names in the comma-joined list.
     if dietary_tags:
-        tag_conditions = []
+        mask = 0
         for tag in dietary_tags:
-            tag_conditions.append("LOWER(mi.dietary_tags) LIKE LOWER(?)")
-            params.append(f"%{tag}%")
-        query += f" AND ({' AND '.join(tag_conditions)})"
+            bit = _TAG_BITS.get(tag.lower())
+            if bit:
+                mask |= bit
+            else:
+                query += " AND (',' || mi.dietary_tags || ',') LIKE ?"
+                params.append(f"%,{tag},%")
+        if mask:
+            query += " AND mi.dietary_mask & ? = ?"
+            params += [mask, mask]
 
     # Nutrition filters
     if min_protein is not None:
@@ -479,47 +640,35 @@ def search_menu(
         query += " AND mi.sugar IS NOT NULL AND mi.sugar <= ?"
         params.append(max_sugar)
 
+    if item_type is not None:
+        query += f" AND {_ITEM_TYPE_SQL[item_type]}"
+
     # Order by protein (descending) for high-protein queries, else by name
     if min_protein:
         query += " ORDER BY mi.protein DESC"
     else:
         query += " ORDER BY mi.calories ASC"
 
-    query += f" LIMIT {limit}"
+    query += " LIMIT ?"
+    params.append(int(limit))  # a fractional limit from a tool call would be a datatype mismatch
 
-    c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
-
-    # Format results
+    # Format results straight off the cursor (no intermediate fetchall list).
+    # The selected columns are already the result keys, in order.
     results = []
     seen = set()  # Deduplicate
 
-    for row in rows:
+    for row in c.execute(query, params):
         key = (row["name"], row["location"], row["period"])
         if key in seen:
             continue
         seen.add(key)
 
-        item_type = _classify_item_type(row["category"])
-
-        results.append({
-            "name": row["name"],
-            "location": row["location"],
-            "period": row["period"],
-            "category": row["category"],
-            "item_type": item_type,  # "component", "entree", or "other"
-            "calories": row["calories"],
-            "protein": row["protein"],
-            "carbs": row["carbs"],
-            "fat": row["fat"],
-            "fiber": row["fiber"],
-            "sugar": row["sugar"],
-            "sodium": row["sodium"],
-            "saturated_fat": row["saturated_fat"],
-            "cholesterol": row["cholesterol"],
-            "dietary_tags": row["dietary_tags"].split(",") if row["dietary_tags"] else []
-        })
+        item = dict(row)
+        if classify:
+            item["item_type"] = _classify_item_type(item["category"])  # "component", "entree", or "other"
+        if split_tags:
+            item["dietary_tags"] = item["dietary_tags"].split(",") if item["dietary_tags"] else []
+        results.append(item)
 
     return results
 
@@ -527,7 +676,8 @@ def search_menu(
 def get_location_items(
     location: str,
     period: Optional[str] = None,
-    limit: int = 40
+    limit: int = 40,
+    fields: Optional[tuple[str, ...]] = None
 ) -> list[dict]:
     """
     Get all menu items from a specific dining location.
@@ -537,6 +687,7 @@ def get_location_items(
         location: Dining hall name (e.g., "Palladium", "Third North")
         period: Optional meal period filter
         limit: Maximum items to return
+        fields: Only these result keys (see search_menu); default: full nutrition
 
     Returns:
         List of all items at that location
@@ -544,6 +695,7 @@ def get_location_items(
     return search_menu(
         location=location,
         period=period,
+        fields=fields,
         limit=limit
     )
 
@@ -606,7 +758,7 @@ def get_complete_meals(
     Returns:
         List of complete meal items (entrees, not components) with 250+ calories
     """
-    all_items = search_menu(
+    return search_menu(
         location=location,
         period=period,
         dietary_tags=dietary_tags,
@@ -616,17 +768,20 @@ def get_complete_meals(
         max_sodium=max_sodium,
         min_fiber=min_fiber,
         max_sugar=max_sugar,
-        limit=limit * 3  # Get more to filter
+        item_type="entree",
+        limit=limit
     )
 
-    # Filter to only entrees with sufficient calories
-    entrees = [
-        item for item in all_items
-        if item.get("item_type") == "entree"
-        and item.get("calories") and item["calories"] >= min_calories
-    ]
 
-    return entrees[:limit]
+# Build-your-own components by role, matched anywhere in the lowercased item name
+# (sauces also in the category); one compiled alternation per role
+PROTEIN_KEYWORDS = ("chicken", "beef", "turkey", "tuna", "salmon", "tofu", "egg", "ham", "bacon", "sausage")
+BASE_KEYWORDS = ("rice", "quinoa", "bread", "tortilla", "pasta", "noodle", "lettuce", "greens", "wrap", "bun", "roll")
+SAUCE_KEYWORDS = ("sauce", "dressing", "mayo", "mustard", "vinegar", "oil", "guac", "salsa", "hummus")
+
+_PROTEIN_RE = re.compile("|".join(map(re.escape, PROTEIN_KEYWORDS)))
+_BASE_RE = re.compile("|".join(map(re.escape, BASE_KEYWORDS)))
+_SAUCE_RE = re.compile("|".join(map(re.escape, SAUCE_KEYWORDS)))
 
 
 def get_build_your_own_options(
@@ -650,16 +805,14 @@ def get_build_your_own_options(
     Returns:
         Dict with categorized components for building a meal
     """
-    all_items = search_menu(
+    components = search_menu(
         location=location,
         period=period,
         dietary_tags=dietary_tags,
+        item_type="component",
         limit=100
     )
 
-    # Filter to components only
-    components = [item for item in all_items if item.get("item_type") == "component"]
-
     # Categorize by likely role in a meal
     proteins = []
     bases = []
@@ -667,19 +820,15 @@ def get_build_your_own_options(
     sauces = []
     other = []
 
-    protein_keywords = ["chicken", "beef", "turkey", "tuna", "salmon", "tofu", "egg", "ham", "bacon", "sausage"]
-    base_keywords = ["rice", "quinoa", "bread", "tortilla", "pasta", "noodle", "lettuce", "greens", "wrap", "bun", "roll"]
-    sauce_keywords = ["sauce", "dressing", "mayo", "mustard", "vinegar", "oil", "guac", "salsa", "hummus"]
-
     for item in components:
         name_lower = item["name"].lower()
         cat_lower = (item.get("category") or "").lower()
 
-        if any(kw in name_lower for kw in protein_keywords) or item.get("protein", 0) and item["protein"] >= 8:
+        if _PROTEIN_RE.search(name_lower) or item.get("protein", 0) and item["protein"] >= 8:
             proteins.append(item)
-        elif any(kw in name_lower for kw in base_keywords):
+        elif _BASE_RE.search(name_lower):
             bases.append(item)
-        elif any(kw in name_lower or kw in cat_lower for kw in sauce_keywords):
+        elif _SAUCE_RE.search(name_lower) or _SAUCE_RE.search(cat_lower):
             sauces.append(item)
         else:
             toppings.append(item)
@@ -751,14 +900,13 @@ def get_full_day_menu(location: str) -> dict:
             mi.dietary_tags
         FROM menu_items mi
         JOIN locations l ON mi.location_id = l.id
-        WHERE mi.date = ? AND LOWER(l.name) LIKE LOWER(?)
+        WHERE mi.date = ? AND l.name LIKE ?
             AND mi.calories >= 80
         ORDER BY mi.period, mi.category, mi.name
     """
 
     c.execute(query, [date, f"%{location}%"])
     rows = c.fetchall()
-    conn.close()
 
     # Group by period
     periods = {}
@@ -1005,6 +1153,6 @@ if __name__ == "__main__":
         print(f"  {r['name']} @ {r['location']} - {r['dietary_tags']}")
 
     print("\nTesting location items:")
-    results = get_location_items("Palladium", period="Lunch", limit=5)
+    results = get_location_items("Palladium", period="Lunch", limit=5, fields=("calories",))
     for r in results:
         print(f"  {r['name']} - {r['calories']} cal")